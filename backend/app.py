@@ -1,86 +1,197 @@
-import os, traceback, numpy as np, tensorflow as tf, mlflow, base64, cv2
-from flask import Flask, request, jsonify, send_from_directory
+import os, io, hmac, json, threading, time, traceback, numpy as np
+from flask import Flask, Request, Response, current_app, g, request, jsonify, send_from_directory, send_file, stream_with_context
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from config import Config
 from utils.pdf_generator import PDFGenerator
 from utils.image_processor import ImageProcessor
 from utils.gemini_api import GeminiAPI
+from utils.batcher import MicroBatcher
+from utils.model_manager import ModelManager
+from utils.metrics import Metrics
+from utils.severity import get_severity
+from utils.profiling import make_profiler
+from utils.result_cache import ResultCache
+from utils.report_queue import ReportQueue, ReportQueueFull
+from utils.batch_analyzer import detach_uploads, iter_batch_uploads, make_preprocess_pool, preprocess_image, stream_results
+
+BATCH_ANALYZE_PATH = '/api/analyze/batch'
+
+class InMemoryRequest(Request):
+    # Single-image uploads are capped by MAX_CONTENT_LENGTH, so keep them in memory instead of spooling large files to a temp file.
+    # Batch uploads can be far larger and keep werkzeug's spooling; their images are decoded lazily a few at a time.
+    @property
+    def max_content_length(self):
+        return current_app.config['BATCH_MAX_CONTENT_LENGTH'] if self.path == BATCH_ANALYZE_PATH else super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.path == BATCH_ANALYZE_PATH: return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return io.BytesIO()
 
 load_dotenv()
-app = Flask(__name__); app.config.from_object(Config); CORS(app)
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True); os.makedirs(app.config['REPORTS_FOLDER'], exist_ok=True)
+app = Flask(__name__); app.request_class = InMemoryRequest; app.config.from_object(Config); CORS(app)
+os.makedirs(app.config['REPORTS_FOLDER'], exist_ok=True)
 
-def load_model_from_registry(model_name, stage="Production"):
-    try:
-        model_uri = f"models:/{model_name}/{stage}"; print(f"Loading model '{model_name}' from stage '{stage}'...")
-        model = mlflow.keras.load_model(model_uri); print(f"Model '{model_name}' loaded successfully.")
-        return model
-    except Exception as e:
-        print(f"Error loading model '{model_name}' from MLflow Registry: {e}"); return None
+MODEL_NAMES = Config.MODEL_NAMES
+metrics = Metrics(); profiler = make_profiler(app.config['PROFILE_MODE'], app.config['PROFILE_SAMPLE_EVERY'], app.config['PROFILE_DIR'])
+result_cache = ResultCache(app.config['RESULT_CACHE_MAX_MB'] * 1024 * 1024, app.config['RESULT_CACHE_TTL'])
+
+# TensorFlow and MLflow are imported by these functions on the loader thread, not when the app is imported.
+def registry_client():
+    import mlflow
+    mlflow.set_tracking_uri("file:./mlruns"); return mlflow.MlflowClient()
+
+def resolve_version(image_type, stage="Production"):
+    """The registry's current version of the model in `stage`; a cheap lookup used to poll for promotions."""
+    model_name = MODEL_NAMES[image_type]; latest = registry_client().get_latest_versions(model_name, stages=[stage])
+    if not latest: raise LookupError(f"Model '{model_name}' has no version in stage '{stage}'.")
+    return latest[0].version
 
-mlflow.set_tracking_uri("file:./mlruns")
-fundus_model = load_model_from_registry('fundus-model')
-oct_model = load_model_from_registry('oct-model')
-image_processor = ImageProcessor(); pdf_generator = PDFGenerator(app.config['REPORTS_FOLDER']); gemini_api = GeminiAPI(os.getenv("GEMINI_API_KEY"))
+def fetch_model(image_type, stage="Production"):
+    """Resolves the stage's latest version and downloads what serving needs: the version's TFLite serving artifact when
+    SERVING_BACKEND is 'tflite' and one passed the export tolerance gate, read into memory so forked workers share it,
+    otherwise the Keras model directory. Runs no TensorFlow ops, so it is safe before fork."""
+    import mlflow
+    model_name = MODEL_NAMES[image_type]; version = registry_client().get_model_version(model_name, resolve_version(image_type, stage))
+    print(f"Fetching model '{model_name}' version {version.version} from stage '{stage}'...")
+    artifact = version.tags.get('serving_artifact') if app.config['SERVING_BACKEND'] == 'tflite' else None
+    if artifact:
+        with open(mlflow.artifacts.download_artifacts(run_id=version.run_id, artifact_path=artifact), 'rb') as f: return {'version': version.version, 'tflite': f.read()}
+    if app.config['SERVING_BACKEND'] == 'tflite': print(f"Model '{model_name}' version {version.version} has no serving artifact; serving it with Keras.")
+    return {'version': version.version, 'keras_path': mlflow.artifacts.download_artifacts(f"models:/{model_name}/{version.version}")}
+
+def build_engine(image_type, source):
+    if 'tflite' in source:
+        from utils.tflite_engine import TFLiteEngine
+        return source['version'], TFLiteEngine(num_threads=app.config['TFLITE_THREADS'], model_content=source['tflite'])
+    import mlflow.keras
+    from utils.grad_cam import GradCamEngine
+    return source['version'], GradCamEngine(mlflow.keras.load_model(source['keras_path']))
+
+def make_batcher(name, engine):
+    def explain(batch):
+        with metrics.time('model_batch', model=name): return engine.explain(batch)
+    return MicroBatcher(name, explain, app.config['BATCH_MAX_SIZE'], app.config['BATCH_MAX_WAIT_MS'])
+
+model_manager = ModelManager(MODEL_NAMES, fetch_model, build_engine, make_batcher, lambda name: np.zeros((1, *app.config['IMAGE_SIZE'], 3), dtype=np.uint8),
+                             resolve=resolve_version, poll_interval=app.config['MODEL_POLL_INTERVAL'], on_swap=lambda name, old, new: result_cache.invalidate(MODEL_NAMES[name]))
+
+image_processor = ImageProcessor(app.config['DECODE_MIN_SIDE'], app.config['OCT_ENHANCE_MODE']); pdf_generator = PDFGenerator(app.config['REPORTS_FOLDER']); gemini_api = GeminiAPI(os.getenv("GEMINI_API_KEY"), timeout=app.config['GEMINI_TIMEOUT'], cache_path=app.config['EXPLANATION_CACHE_PATH'],
+                       cacheable_diseases={c for c in Config.FUNDUS_CLASSES + Config.OCT_CLASSES if c != 'normal'})
+def record_report(status):
+    metrics.inc('reports_total', status=status['status'])
+    if status['started_at']:
+        metrics.observe('stage_duration_seconds', status['started_at'] - status['submitted_at'], stage='report_queue_wait')
+        metrics.observe('stage_duration_seconds', status['finished_at'] - status['started_at'], stage='report_pdf')
+
+report_queue = ReportQueue(pdf_generator, app.config['REPORT_WORKERS'], app.config['REPORT_QUEUE_SIZE'], app.config['REPORT_RETENTION'], on_done=record_report)
+
+def start_background_tasks():
+    """Startup work that loads models or calls external services; run once per serving process, never on import."""
+    model_manager.start(); gemini_api.prewarm_explanations()
 
 def allowed_file(filename): return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg'}
 
-def predict(model, image_path, image_type, class_list):
+def upload_buffer(file):
+    stream = file.stream
+    return stream.getbuffer() if isinstance(stream, io.BytesIO) else stream.read()
+
+preprocess_pool, preprocess_pool_lock = None, threading.Lock()
+
+def get_preprocess_pool():
+    global preprocess_pool
+    with preprocess_pool_lock:
+        if preprocess_pool is None:
+            preprocess_pool = make_preprocess_pool(app.config['PREPROCESS_WORKERS'], app.config['DECODE_MIN_SIDE'], app.config['OCT_ENHANCE_MODE'])
+        return preprocess_pool
+
+def preprocess_local(image_data, image_type):
+    return image_processor.preprocess_fundus(image_data) if image_type == 'fundus' else image_processor.enhance_oct(image_data)
+
+def preprocess_in_pool(image_data, image_type): return get_preprocess_pool().submit(preprocess_image, bytes(image_data), image_type).result()
+
+def predict(model, image_data, image_type, class_list, preprocess=preprocess_local, use_cache=True):
+    """Batch scoring passes use_cache=False so one large batch cannot evict the interactive results."""
     if model is None: return "Model not loaded", 0.0, "Unknown", None, None
     try:
-        img_array = image_processor.preprocess_fundus(image_path) if image_type == 'fundus' else image_processor.enhance_oct(image_path)
-        img_batch = np.expand_dims(img_array, axis=0)
-        preprocessed_batch = tf.keras.applications.efficientnet_v2.preprocess_input(img_batch)
-        predictions = model.predict(preprocessed_batch); confidence = float(np.max(predictions[0]))
-        predicted_class_idx = np.argmax(predictions[0]); class_name = class_list[predicted_class_idx]
+        cache_key = None
+        if use_cache:
+            with metrics.time('cache_lookup', image_type=image_type):
+                cache_key = result_cache.make_key(image_data, MODEL_NAMES[image_type], model.version, image_type); cached = result_cache.get(cache_key)
+            if cached is not None: return cached
+        with metrics.time('preprocess', image_type=image_type): img_array = preprocess(image_data, image_type)
+        with metrics.time('inference', image_type=image_type): probabilities, cam = model.batcher.predict(img_array)
+        metrics.inc('model_inferences_total', model=image_type, version=model.version); confidence = float(np.max(probabilities))
+        predicted_class_idx = np.argmax(probabilities); class_name = class_list[predicted_class_idx]
         severity = get_severity(class_name, confidence, image_type)
         heatmap_b64, original_b64 = None, None
         if class_name != 'normal':
-            last_conv_layer = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.Conv2D)][-1].name
-            heatmap_b64 = image_processor.generate_grad_cam(model, img_array, last_conv_layer)
-        _, buffer = cv2.imencode('.jpg', cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR))
-        original_b64 = base64.b64encode(buffer).decode('utf-8')
-        return class_name, confidence, severity, heatmap_b64, original_b64
+            with metrics.time('gradcam_overlay', image_type=image_type): heatmap_b64 = image_processor.overlay_heatmap(img_array, cam)
+        with metrics.time('encode', image_type=image_type):
+            original_b64 = image_processor.encode_jpeg_b64(img_array)
+        result = (class_name, confidence, severity, heatmap_b64, original_b64)
+        if cache_key is not None: result_cache.put(cache_key, result)
+        return result
     except Exception as e:
         traceback.print_exc(); return "Prediction Error", 0.0, str(e), None, None
 
-def get_severity(disease, confidence, image_type):
-    severity_mappings = Config.SEVERITY_LEVELS[image_type].get(disease)
-    if not severity_mappings: return "Not Applicable"
-    if isinstance(severity_mappings, str): return severity_mappings
-    for threshold, level in severity_mappings:
-        if confidence >= threshold: return level
-    return "Undetermined"
-
 @app.route('/api/analyze', methods=['POST'])
 def analyze_image():
-    fundus_path, oct_path = None, None
+    with metrics.breakdown() as timings: return analyze_request(timings)
+
+def analyze_request(timings):
     try:
+        with metrics.time('upload'): request.files  # parses the multipart body
         patient_data = {k: request.form.get(k) for k in ['name', 'age', 'gender', 'diabetesType', 'diabetesDuration', 'phone', 'email']}
         patient_data['symptoms'] = request.form.getlist('symptoms[]'); results = {}
         if 'fundusImage' in request.files:
             fundus_file = request.files['fundusImage']
             if fundus_file and allowed_file(fundus_file.filename):
-                fundus_filename = secure_filename(f"fundus_{fundus_file.filename}"); fundus_path = os.path.join(app.config['UPLOAD_FOLDER'], fundus_filename)
-                fundus_file.save(fundus_path); disease, conf, severity, heatmap, original = predict(fundus_model, fundus_path, 'fundus', Config.FUNDUS_CLASSES)
+                with model_manager.use('fundus') as model: disease, conf, severity, heatmap, original = predict(model, upload_buffer(fundus_file), 'fundus', Config.FUNDUS_CLASSES)
                 results['fundus'] = {'disease': disease, 'confidence': round(conf * 100, 2), 'severity': severity, 'heatmap_b64': heatmap, 'original_b64': original}
         if 'octImage' in request.files:
             oct_file = request.files['octImage']
             if oct_file and allowed_file(oct_file.filename):
-                oct_filename = secure_filename(f"oct_{oct_file.filename}"); oct_path = os.path.join(app.config['UPLOAD_FOLDER'], oct_filename)
-                oct_file.save(oct_path); disease, conf, severity, heatmap, original = predict(oct_model, oct_path, 'oct', Config.OCT_CLASSES)
+                with model_manager.use('oct') as model: disease, conf, severity, heatmap, original = predict(model, upload_buffer(oct_file), 'oct', Config.OCT_CLASSES)
                 results['oct'] = {'disease': disease, 'confidence': round(conf * 100, 2), 'severity': severity, 'heatmap_b64': heatmap, 'original_b64': original}
         if not results: return jsonify({'error': 'No valid images provided.'}), 400
-        recommendations = gemini_api.get_recommendations(patient_data, results)
-        report_filename = pdf_generator.generate_report(patient_data, results, recommendations)
-        return jsonify({'success': True, 'results': results, 'recommendations': recommendations, 'report_url': f'/api/download-report/{report_filename}'})
+        recommendations_start = time.perf_counter(); recommendations = gemini_api.get_recommendations_async(patient_data, results)
+        recommendations.add_done_callback(lambda _: metrics.observe('stage_duration_seconds', time.perf_counter() - recommendations_start, stage='gemini'))
+        report_id = report_queue.submit(patient_data, results, recommendations)
+        with metrics.time('recommendations_wait'): recommendations_text = recommendations.result()
+        response = {'success': True, 'results': results, 'recommendations': recommendations_text, 'report_id': report_id,
+                    'report_status_url': f'/api/report-status/{report_id}', 'report_url': f'/api/download-report/{report_id}'}
+        if request.args.get('timings') == '1': response['timings_ms'] = timings
+        return jsonify(response)
+    except ReportQueueFull as e:
+        print(f"Error in /api/analyze: {e}"); return jsonify({'error': 'Report generation is busy, please retry shortly.'}), 503, {'Retry-After': '5'}
     except Exception as e:
         print(f"Error in /api/analyze: {e}"); return jsonify({'error': 'An internal server error occurred.'}), 500
-    finally:
-        if fundus_path and os.path.exists(fundus_path): os.remove(fundus_path)
-        if oct_path and os.path.exists(oct_path): os.remove(oct_path)
+
+@app.route(BATCH_ANALYZE_PATH, methods=['POST'])
+def analyze_batch():
+    default_type = request.form.get('imageType', 'fundus'); include_images = request.args.get('include_images') == '1'
+    if default_type not in MODEL_NAMES: return jsonify({'error': f"imageType must be one of {sorted(MODEL_NAMES)}."}), 400
+    uploads = detach_uploads(request.files)
+    if not uploads: return jsonify({'error': 'No images provided.'}), 400
+    classes = {'fundus': Config.FUNDUS_CLASSES, 'oct': Config.OCT_CLASSES}
+    def analyze(index, filename, image_type, data):
+        if image_type is None: return {'index': index, 'filename': filename, 'error': data}
+        with model_manager.use(image_type) as model: disease, conf, severity, heatmap, original = predict(model, data, image_type, classes[image_type], preprocess=preprocess_in_pool, use_cache=False)
+        result = {'index': index, 'filename': filename, 'image_type': image_type, 'disease': disease, 'confidence': round(conf * 100, 2), 'severity': severity}
+        if include_images: result.update({'heatmap_b64': heatmap, 'original_b64': original})
+        return result
+    def generate():
+        total, errors = 0, 0
+        try:
+            items = iter_batch_uploads(uploads, default_type, app.config['MAX_CONTENT_LENGTH'])
+            for result in stream_results(items, analyze, app.config['BATCH_MAX_INFLIGHT']):
+                total += 1; errors += 'error' in result or result.get('disease') in ('Prediction Error', 'Model not loaded')
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            print(f"Error in {BATCH_ANALYZE_PATH}: {e}"); errors += 1; yield json.dumps({'error': 'Batch analysis aborted.'}) + '\n'
+        yield json.dumps({'summary': {'total': total, 'errors': errors}}) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/api/explain', methods=['POST'])
 def explain_disease():
@@ -95,11 +206,72 @@ def explain_disease():
         print(f"Error in /api/explain: {e}")
         return jsonify({'error': 'Failed to generate explanation.'}), 500
 
-@app.route('/api/download-report/<filename>')
-def download_report(filename): return send_from_directory(app.config['REPORTS_FOLDER'], filename, as_attachment=True)
+@app.route('/api/report-status/<report_id>')
+def report_status(report_id):
+    status = report_queue.status(report_id)
+    if status is None: return jsonify({'error': 'Unknown report ID.'}), 404
+    if status['status'] == 'ready': status['download_url'] = f'/api/download-report/{report_id}'
+    return jsonify(status)
+
+@app.route('/api/download-report/<report_id>')
+def download_report(report_id):
+    status = report_queue.wait(report_id, app.config['REPORT_DOWNLOAD_WAIT'])
+    if status is None: return send_from_directory(app.config['REPORTS_FOLDER'], report_id, as_attachment=True)
+    if status['status'] == 'failed': return jsonify({'error': 'Report generation failed.'}), 500
+    if status['status'] != 'ready': return jsonify(status), 202, {'Retry-After': '2'}
+    return send_file(os.path.join(app.config['REPORTS_FOLDER'], status['filename']), as_attachment=True, download_name=status['filename'])
+
+@app.before_request
+def start_request():
+    g.request_start = time.perf_counter(); g.profile = profiler.start() if profiler is not None else None
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start, endpoint=endpoint, method=request.method)
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    if profiler is not None: profiler.stop(g.pop('profile', None), request.path)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    metrics.set('models_ready', int(model_manager.is_ready()))
+    for name in MODEL_NAMES:
+        model = model_manager.get(name)
+        if model is None: continue
+        metrics.set('served_model_version', model.version, model=name)
+        for key in ('queue_depth', 'max_queue_depth', 'avg_batch_size'): metrics.set(f"batcher_{key}", model.batcher.stats()[key], model=name)
+    for key, value in result_cache.stats().items(): metrics.set(f"result_cache_{key}", value)
+    for status, count in report_queue.stats().items(): metrics.set('report_jobs', count, status=status)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/health')
-def health_check(): return jsonify({'status': 'healthy', 'fundus_model_loaded': fundus_model is not None, 'oct_model_loaded': oct_model is not None})
+def health_check():
+    models = {name: model_manager.get(name) for name in MODEL_NAMES}; status = model_manager.status()
+    return jsonify({'status': 'healthy', 'ready': status['ready'], 'fundus_model_loaded': models['fundus'] is not None, 'oct_model_loaded': models['oct'] is not None,
+                    'model_versions': {name: model.version for name, model in models.items() if model is not None}, 'models': status['models'], 'last_reload': status['last_reload'], 'result_cache': result_cache.stats(), 'reports': report_queue.stats(),
+                    'batching': {name: model.batcher.stats() for name, model in models.items() if model is not None}})
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_models():
+    """Loads newly promoted versions in the background; requires the X-Admin-Token header to match ADMIN_TOKEN.
+    Only the worker process that receives the request reloads. The others pick the version up on their next registry
+    poll; to reload every worker at once, send SIGHUP to the gunicorn master (new workers resolve the current version)."""
+    if not app.config['ADMIN_TOKEN']: return jsonify({'error': 'Admin endpoints are disabled.'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), app.config['ADMIN_TOKEN'].encode()): return jsonify({'error': 'Forbidden.'}), 403
+    data = request.get_json(silent=True) or {}; names = data.get('models') or list(MODEL_NAMES)
+    if any(name not in MODEL_NAMES for name in names): return jsonify({'error': f"models must be a subset of {sorted(MODEL_NAMES)}."}), 400
+    model_manager.reload(names, force=bool(data.get('force')))
+    return jsonify({'queued': names, 'scope': 'worker', 'pid': os.getpid(), 'status_url': '/api/health'}), 202
+
+@app.route('/api/health/live')
+def liveness():
+    return jsonify({'status': 'alive'})
+
+@app.route('/api/health/ready')
+def readiness():
+    status = model_manager.status(); status['pid'] = os.getpid()
+    return jsonify(status), 200 if status['ready'] else 503
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    start_background_tasks(); app.run(debug=True, port=5000)
@@ -0,0 +1,43 @@
+"""Throughput vs p99 latency of per-request inference against the MicroBatcher at 1/8/32 concurrent clients.
+
+    python benchmarks/bench_batching.py                       # synthetic model with a fixed per-call overhead
+    python benchmarks/bench_batching.py --model path/to.h5    # a real Keras model
+"""
+import argparse, threading, time, numpy as np
+from common import run_clients, summarize
+from utils.batcher import MicroBatcher
+
+class SyntheticModel:
+    """Stands in for a Keras model: a fixed per-call overhead plus a per-image cost, serialized like a single CPU model."""
+    def __init__(self, call_overhead_ms=20.0, per_image_ms=2.0, num_classes=4):
+        self.call_overhead, self.per_image, self.num_classes = call_overhead_ms / 1000, per_image_ms / 1000, num_classes; self._lock = threading.Lock()
+    def predict_on_batch(self, batch):
+        with self._lock: time.sleep(self.call_overhead + self.per_image * len(batch))
+        return np.full((len(batch), self.num_classes), 1.0 / self.num_classes, dtype=np.float32)
+
+def load_model(path):
+    if not path: return SyntheticModel()
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dynamic micro-batching.")
+    parser.add_argument('--model', type=str, default=None); parser.add_argument('--requests', type=int, default=64, help="Requests per client.")
+    parser.add_argument('--max-batch-size', type=int, default=16); parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+    model = load_model(args.model); image = np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8)
+    model_lock = threading.Lock()
+    def unbatched(client_id, i):
+        with model_lock: model.predict_on_batch(np.expand_dims(image, 0).astype(np.float32))
+    batcher = MicroBatcher('bench', lambda batch: model.predict_on_batch(batch.astype(np.float32)), args.max_batch_size, args.max_wait_ms)
+    batched = lambda client_id, i: batcher.predict(image)
+    unbatched(0, 0); batched(0, 0)
+    print(f"{'clients':>7} {'mode':>10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in (1, 8, 32):
+        for mode, fn in (('unbatched', unbatched), ('batched', batched)):
+            result = summarize(*run_clients(fn, concurrency, args.requests))
+            print(f"{concurrency:>7} {mode:>10} {result['throughput_rps']:>9} {result['p50_ms']:>9} {result['p99_ms']:>9}")
+    print("\nBatch sizes:", batcher.stats()['batch_size_histogram']); batcher.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Latency and accuracy parity of reduced-resolution JPEG decode (DECODE_MIN_SIDE) for fundus preprocessing.
+
+    python benchmarks/bench_fundus_decode.py --images ../dataset/fundus/validation --model path/to/fundus_model.h5
+    python benchmarks/bench_fundus_decode.py            # synthetic 4000px photos, image parity only
+
+With class sub-directories under --images, accuracy per setting is reported as well as agreement with full decode.
+"""
+import argparse, time, cv2, numpy as np
+from common import percentile
+from config import Config
+from bench_oct_enhance import psnr
+from utils.image_processor import ImageProcessor
+
+def load_images(directory, limit):
+    if directory:
+        from bench_oct_enhance import load_images as load_directory
+        return load_directory(directory, limit)
+    rng, samples = np.random.default_rng(0), []
+    for _ in range(limit):
+        photo = np.zeros((3000, 4000, 3), dtype=np.uint8); cv2.circle(photo, (2000, 1500), 1400, (30, 80, 190), -1)
+        cv2.circle(photo, (2500, 1400), 220, (150, 200, 240), -1)
+        photo = np.clip(photo.astype(np.int16) + rng.integers(-12, 12, photo.shape), 0, 255).astype(np.uint8)
+        samples.append((cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes(), None))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced JPEG decode for fundus images.")
+    parser.add_argument('--images', type=str, default=None); parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--model', type=str, default=None, help="Keras fundus model for prediction parity.")
+    parser.add_argument('--min-sides', type=int, nargs='+', default=[0, 896, 448, 224])
+    args = parser.parse_args()
+    samples = load_images(args.images, args.limit); engine = None
+    if args.model:
+        import tensorflow as tf
+        from utils.grad_cam import GradCamEngine
+        engine = GradCamEngine(tf.keras.models.load_model(args.model))
+    outputs, predictions = {}, {}
+    print(f"{'min side':>8} {'p50 ms':>8} {'p95 ms':>8} {'PSNR dB':>8} {'agree %':>8} {'acc %':>7}")
+    for min_side in args.min_sides:
+        processor, latencies, images = ImageProcessor(reduced_decode_min_side=min_side), [], []
+        for data, _ in samples:
+            start = time.perf_counter(); images.append(processor.preprocess_fundus(data)); latencies.append((time.perf_counter() - start) * 1000)
+        outputs[min_side] = np.stack(images); reference = args.min_sides[0]
+        quality = np.mean([psnr(a, b) for a, b in zip(outputs[min_side], outputs[reference])])
+        agree = acc = '-'
+        if engine:
+            predictions[min_side] = np.argmax(engine.predict(outputs[min_side]), axis=1)
+            agree = round(100 * float(np.mean(predictions[min_side] == predictions[reference])), 1)
+            labels = [label for _, label in samples]
+            if all(label in Config.FUNDUS_CLASSES for label in labels):
+                acc = round(100 * float(np.mean(predictions[min_side] == np.array([Config.FUNDUS_CLASSES.index(l) for l in labels]))), 1)
+        print(f"{min_side:>8} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} {quality:>8.1f} {agree:>8} {acc:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Images/sec (and per core) of the ImageProcessor batch APIs against looping over the per-image methods.
+
+    python benchmarks/bench_image_batch.py --images 64 --threads 1 2 4 8
+
+'per-image (CLAHE per call)' reproduces the old behaviour of creating a CLAHE object for every image.
+"""
+import argparse, os, time, cv2, numpy as np
+import common
+from utils.image_processor import ImageProcessor
+
+class PerCallClaheProcessor(ImageProcessor):
+    def _clahe(self, kind):
+        return cv2.createCLAHE(clipLimit=3.0 if kind == 'fundus' else 2.0, tileGridSize=(8, 8))
+
+def synthetic_inputs(count):
+    rng = np.random.default_rng(0); fundus, scans = [], []
+    for _ in range(count):
+        img = np.zeros((1536, 2048, 3), dtype=np.uint8); cv2.circle(img, (1024, 768), 700, tuple(int(c) for c in rng.integers(30, 220, 3)), -1)
+        fundus.append(cv2.imencode('.jpg', img)[1].tobytes())
+        scans.append(cv2.imencode('.png', rng.integers(0, 255, (496, 768), dtype=np.uint8))[1].tobytes())
+    return fundus, scans
+
+def rate(fn, count, repeats=3):
+    fn(); best = min(_timed(fn) for _ in range(repeats))
+    return count / best
+
+def _timed(fn):
+    start = time.perf_counter(); fn(); return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ImageProcessor batch APIs.")
+    parser.add_argument('--images', type=int, default=32); parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--oct-mode', type=str, default='median', help="OCT denoise mode ('full' is dominated by NL-means).")
+    args = parser.parse_args()
+    fundus, scans = synthetic_inputs(args.images); cams = np.random.default_rng(0).random((args.images, 7, 7), dtype=np.float32)
+    cv2.setNumThreads(1)  # one core per worker thread, so images/sec per core is comparable across rows
+    print(f"{'variant':<32} {'threads':>7} {'fundus img/s':>13} {'per core':>9} {'oct img/s':>10} {'per core':>9} {'overlay img/s':>14}")
+    for label, cls, threads, batched in [('per-image (CLAHE per call)', PerCallClaheProcessor, 1, False), ('per-image', ImageProcessor, 1, False),
+                                         *[('batch', ImageProcessor, t, True) for t in sorted(set(args.threads))]]:
+        processor = cls(oct_enhance_mode=args.oct_mode, batch_workers=threads)
+        if batched:
+            run_fundus = lambda: processor.preprocess_fundus_batch(fundus); run_oct = lambda: processor.enhance_oct_batch(scans)
+            images = processor.preprocess_fundus_batch(fundus); run_overlay = lambda: processor.overlay_heatmap_batch(images, cams)
+        else:
+            run_fundus = lambda: np.stack([processor.preprocess_fundus(f) for f in fundus]); run_oct = lambda: np.stack([processor.enhance_oct(s) for s in scans])
+            images = run_fundus(); run_overlay = lambda: [processor.overlay_heatmap(img, cam) for img, cam in zip(images, cams)]
+        cores = min(threads, os.cpu_count() or 1); fundus_rate, oct_rate = rate(run_fundus, args.images), rate(run_oct, args.images)
+        print(f"{label:<32} {threads:>7} {fundus_rate:>13.1f} {fundus_rate / cores:>9.1f} {oct_rate:>10.1f} {oct_rate / cores:>9.1f} {rate(run_overlay, args.images):>14.1f}")
+        processor.close()
+
+if __name__ == '__main__':
+    main()
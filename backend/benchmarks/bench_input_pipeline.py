@@ -0,0 +1,49 @@
+"""Training input throughput: ImageDataGenerator.flow_from_directory vs the tf.data pipeline (first, uncached
+epoch and later, cached epochs).
+
+    python benchmarks/bench_input_pipeline.py --dataset ../dataset/fundus --type fundus
+    python benchmarks/bench_input_pipeline.py            # synthetic 1024px fundus-like JPEGs
+"""
+import argparse, os, tempfile, time, cv2, numpy as np
+import common
+from config import Config
+from model_training import EyeDiseaseModelTrainer
+
+def make_synthetic_dataset(root, classes, per_class):
+    rng = np.random.default_rng(0)
+    for split in ('train', 'validation'):
+        for class_name in classes:
+            os.makedirs(os.path.join(root, split, class_name), exist_ok=True)
+            for i in range(per_class):
+                img = np.zeros((768, 1024, 3), dtype=np.uint8); cv2.circle(img, (512, 384), 360, tuple(int(c) for c in rng.integers(20, 220, 3)), -1)
+                cv2.imwrite(os.path.join(root, split, class_name, f"{i}.jpg"), img)
+
+def images_per_second(dataset, limit_batches=None):
+    count, start = 0, time.perf_counter()
+    for i, (x, _) in enumerate(dataset):
+        count += len(x)
+        if limit_batches and i + 1 >= limit_batches: break
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training input pipeline.")
+    parser.add_argument('--dataset', type=str, default=None); parser.add_argument('--type', type=str, default='fundus', choices=['fundus', 'oct'])
+    parser.add_argument('--per-class', type=int, default=64, help="Synthetic images per class and split.")
+    args = parser.parse_args()
+    classes = Config.FUNDUS_CLASSES if args.type == 'fundus' else Config.OCT_CLASSES
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_path = args.dataset or os.path.join(tmp, 'data')
+        if not args.dataset: make_synthetic_dataset(dataset_path, classes, args.per_class)
+        trainer = EyeDiseaseModelTrainer({'type': args.type, 'dataset_path': dataset_path, 'classes': classes})
+        import tensorflow as tf
+        from tensorflow.keras.preprocessing.image import ImageDataGenerator
+        generator = ImageDataGenerator(rotation_range=20, width_shift_range=0.2, height_shift_range=0.2, horizontal_flip=True, zoom_range=0.2, shear_range=0.2, fill_mode='nearest',
+                                       preprocessing_function=tf.keras.applications.efficientnet_v2.preprocess_input).flow_from_directory(
+            os.path.join(dataset_path, 'train'), target_size=trainer.img_size, batch_size=trainer.batch_size, class_mode='categorical', shuffle=True, classes=classes)
+        print(f"ImageDataGenerator:        {images_per_second(generator, len(generator)):8.1f} images/s")
+        trainer.prepare_data()
+        print(f"tf.data epoch 1 (decode):  {images_per_second(trainer.train_ds):8.1f} images/s")
+        print(f"tf.data epoch 2 (cached):  {images_per_second(trainer.train_ds):8.1f} images/s")
+
+if __name__ == '__main__':
+    main()
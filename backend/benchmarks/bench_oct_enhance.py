@@ -0,0 +1,63 @@
+"""Latency and accuracy parity of the OCT enhancement modes against the original full-resolution path.
+
+    python benchmarks/bench_oct_enhance.py --images ../dataset/oct/validation --model path/to/oct_model.h5
+    python benchmarks/bench_oct_enhance.py            # synthetic speckled B-scans, image parity only
+
+With class sub-directories under --images, accuracy per mode is reported as well as agreement with 'full'.
+"""
+import argparse, os, time, cv2, numpy as np
+from common import percentile
+from config import Config
+from utils.image_processor import ImageProcessor, OCT_ENHANCE_MODES
+
+def load_images(directory, limit):
+    samples = []
+    if directory:
+        for root, _, files in sorted(os.walk(directory)):
+            label = os.path.basename(root)
+            for filename in sorted(files):
+                if filename.lower().endswith(('png', 'jpg', 'jpeg')):
+                    with open(os.path.join(root, filename), 'rb') as f: samples.append((f.read(), label))
+                if len(samples) >= limit: return samples
+        return samples
+    rng = np.random.default_rng(0)
+    for _ in range(limit):
+        scan = np.zeros((496, 1024), dtype=np.float32); scan[200:260] = 180; scan[260:300] = 90
+        scan = np.clip(scan * rng.gamma(4.0, 0.25, scan.shape), 0, 255).astype(np.uint8)
+        samples.append((cv2.imencode('.png', scan)[1].tobytes(), None))
+    return samples
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCT enhancement modes.")
+    parser.add_argument('--images', type=str, default=None); parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--model', type=str, default=None, help="Keras OCT model for prediction parity.")
+    args = parser.parse_args()
+    samples = load_images(args.images, args.limit); processor = ImageProcessor()
+    engine = None
+    if args.model:
+        import tensorflow as tf
+        from utils.grad_cam import GradCamEngine
+        engine = GradCamEngine(tf.keras.models.load_model(args.model))
+    outputs, predictions = {}, {}
+    print(f"{'mode':>11} {'p50 ms':>8} {'p95 ms':>8} {'PSNR dB':>8} {'agree %':>8} {'acc %':>7}")
+    for mode in OCT_ENHANCE_MODES:
+        latencies, images = [], []
+        for data, _ in samples:
+            start = time.perf_counter(); images.append(processor.enhance_oct(data, mode)); latencies.append((time.perf_counter() - start) * 1000)
+        outputs[mode] = np.stack(images)
+        if engine: predictions[mode] = np.argmax(engine.predict(outputs[mode]), axis=1)
+        quality = np.mean([psnr(a, b) for a, b in zip(outputs[mode], outputs['full'])])
+        agree = acc = '-'
+        if engine:
+            agree = round(100 * float(np.mean(predictions[mode] == predictions['full'])), 1)
+            labels = [label for _, label in samples]
+            if all(label in Config.OCT_CLASSES for label in labels):
+                acc = round(100 * float(np.mean(predictions[mode] == np.array([Config.OCT_CLASSES.index(l) for l in labels]))), 1)
+        print(f"{mode:>11} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} {quality:>8.1f} {agree:>8} {acc:>7}")
+
+if __name__ == '__main__':
+    main()
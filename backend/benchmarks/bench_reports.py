@@ -0,0 +1,32 @@
+"""Reports/sec of the background report queue at increasing worker-pool sizes.
+
+    python benchmarks/bench_reports.py --reports 40
+"""
+import argparse, tempfile, time
+from common import percentile
+from utils.pdf_generator import PDFGenerator
+from utils.report_queue import ReportQueue
+from utils.gemini_api import GeminiAPI
+
+PATIENT = {'name': 'Bench Patient', 'age': '58', 'gender': 'Female', 'diabetesType': 'Type 2', 'diabetesDuration': '12', 'phone': '555-0100', 'email': 'bench@example.com', 'symptoms': ['Blurred vision', 'Floaters']}
+RESULTS = {'fundus': {'disease': 'diabetic_retinopathy', 'confidence': 87.2, 'severity': 'Proliferative'}, 'oct': {'disease': 'macular_edema', 'confidence': 64.1, 'severity': 'Moderate'}}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark background PDF report generation.")
+    parser.add_argument('--reports', type=int, default=40); parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    recommendations = GeminiAPI(None)._get_default_recommendations()
+    print(f"{'workers':>7} {'reports/s':>10} {'p95 job s':>10}")
+    with tempfile.TemporaryDirectory() as reports_dir:
+        generator = PDFGenerator(reports_dir); generator.generate_report(PATIENT, RESULTS, recommendations)
+        for workers in args.workers:
+            queue = ReportQueue(generator, max_workers=workers, max_pending=args.reports)
+            start = time.perf_counter(); job_ids = [queue.submit(PATIENT, RESULTS, recommendations) for _ in range(args.reports)]
+            for job_id in job_ids: assert queue.wait(job_id)['status'] == 'ready'
+            elapsed = time.perf_counter() - start
+            statuses = [queue.status(job_id) for job_id in job_ids]; queue.close()
+            job_latencies = [status['finished_at'] - status['submitted_at'] for status in statuses]
+            print(f"{workers:>7} {args.reports / elapsed:>10.1f} {percentile(job_latencies, 95):>10.3f}")
+
+if __name__ == '__main__':
+    main()
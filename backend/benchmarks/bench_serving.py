@@ -0,0 +1,159 @@
+"""Serving benchmark and load test: per-stage latency, end-to-end /api/analyze throughput under concurrent clients, and
+peak memory, using stand-in models, synthetic images and a fake Gemini client (see standins.py). Results are written
+as JSON and can be compared between commits; the comparison exits non-zero when a metric regresses past its threshold.
+
+    python benchmarks/bench_serving.py run --output before.json
+    python benchmarks/bench_serving.py run --output after.json --compare before.json --threshold 0.15 --metric-threshold 'stage.*.p95_ms=0.5'
+    python benchmarks/bench_serving.py compare before.json after.json
+"""
+import argparse, fnmatch, json, logging, os, resource, subprocess, sys, tempfile, threading, time, urllib.request, uuid, numpy as np
+from common import percentile, run_clients, summarize
+from config import Config
+from standins import FakeGemini, standin_models, synthetic_fundus, synthetic_oct
+
+PATIENT = {'name': 'Bench Patient', 'age': '58', 'gender': 'Female', 'diabetesType': 'Type 2', 'diabetesDuration': '12', 'phone': '555-0100', 'email': 'bench@example.com'}
+
+def metric(value, better, unit): return {'value': round(float(value), 3), 'better': better, 'unit': unit}
+
+def peak_rss_mb(): return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def time_stage(fn, inputs, warmup=2):
+    for item in inputs[:warmup]: fn(item)
+    latencies = []
+    for item in inputs:
+        start = time.perf_counter(); fn(item); latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def start_app(models, reports_dir, gemini_delay):
+    """Imports the Flask app and swaps in the stand-in models, the fake Gemini client and a temp reports folder."""
+    import app as app_module
+    from utils.gemini_api import GeminiAPI
+    from utils.grad_cam import GradCamEngine
+    from utils.model_manager import ModelManager
+    app_module.model_manager = ModelManager(app_module.MODEL_NAMES, lambda name: {'version': 'standin'}, lambda name, source: (source['version'], GradCamEngine(models[name])),
+                                            app_module.make_batcher, lambda name: np.zeros((1, *Config.IMAGE_SIZE, 3), dtype=np.uint8))
+    app_module.model_manager.start()
+    if not app_module.model_manager.wait_ready(300): raise RuntimeError(f"stand-in models failed to load: {app_module.model_manager.status()}")
+    app_module.gemini_api = GeminiAPI(None, model=FakeGemini(gemini_delay))
+    app_module.pdf_generator.reports_dir = reports_dir; app_module.app.config['REPORTS_FOLDER'] = reports_dir
+    return app_module
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex; parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode() for k, v in fields.items()]
+    for field, (filename, data, content_type) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n')
+    return b''.join(parts) + f'--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+def bench_stages(app_module, iterations):
+    processor, results = app_module.image_processor, {}
+    fundus, scans = [synthetic_fundus(i) for i in range(iterations)], [synthetic_oct(i) for i in range(iterations)]
+    fundus_arrays, oct_arrays = [processor.preprocess_fundus(f) for f in fundus], [processor.enhance_oct(s) for s in scans]
+    engines = {name: app_module.model_manager.get(name).engine for name in ('fundus', 'oct')}
+    cam = engines['fundus'].explain(fundus_arrays[0][None])[1][0]
+    stages = {
+        'preprocess_fundus': (processor.preprocess_fundus, fundus),
+        'enhance_oct': (processor.enhance_oct, scans),
+        'gradcam_fundus': (lambda img: engines['fundus'].explain(img[None]), fundus_arrays),
+        'gradcam_oct': (lambda img: engines['oct'].explain(img[None]), oct_arrays),
+        'overlay_heatmap': (lambda img: processor.overlay_heatmap(img, cam), fundus_arrays),
+        'predict_fundus': (lambda data: app_module.predict(app_module.model_manager.get('fundus'), data, 'fundus', Config.FUNDUS_CLASSES), [synthetic_fundus(10_000 + i) for i in range(iterations)]),
+        'generate_report': (lambda i: app_module.pdf_generator.generate_report(dict(PATIENT, name=f'Bench {i}'), {'fundus': {'disease': 'glaucoma', 'confidence': 81.5, 'severity': 'Severe'},
+                                                                                                                   'oct': {'disease': 'macular_edema', 'confidence': 64.1, 'severity': 'Moderate'}},
+                                                                             FakeGemini().text), list(range(iterations))),
+    }
+    for name, (fn, inputs) in stages.items():
+        latencies = time_stage(fn, inputs)
+        results[f"stage.{name}.p50_ms"] = metric(percentile(latencies, 50), 'lower', 'ms'); results[f"stage.{name}.p95_ms"] = metric(percentile(latencies, 95), 'lower', 'ms')
+        print(f"  {name:<18} p50 {percentile(latencies, 50):8.1f} ms   p95 {percentile(latencies, 95):8.1f} ms")
+    return results
+
+def bench_load(app_module, concurrency_levels, requests_per_client):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True); threading.Thread(target=server.serve_forever, daemon=True).start()
+    url, results, seed = f"http://127.0.0.1:{server.server_port}/api/analyze", {}, [0]
+    try:
+        for concurrency in concurrency_levels:
+            total = concurrency * requests_per_client; base = seed[0]; seed[0] += total
+            bodies = [multipart(PATIENT, {'fundusImage': ('eye.jpg', synthetic_fundus(base + i), 'image/jpeg'), 'octImage': ('scan.png', synthetic_oct(base + i), 'image/png')}) for i in range(total)]
+            errors = []
+            def client(client_id, i):
+                body, content_type = bodies[client_id * requests_per_client + i]
+                try:
+                    with urllib.request.urlopen(urllib.request.Request(url, data=body, headers={'Content-Type': content_type}), timeout=120) as response: response.read()
+                except Exception as e: errors.append(e)
+            summary = summarize(*run_clients(client, concurrency, requests_per_client))
+            prefix = f"e2e.c{concurrency}"
+            results.update({f"{prefix}.throughput_rps": metric(summary['throughput_rps'], 'higher', 'req/s'), f"{prefix}.p50_ms": metric(summary['p50_ms'], 'lower', 'ms'),
+                            f"{prefix}.p99_ms": metric(summary['p99_ms'], 'lower', 'ms'), f"{prefix}.errors": metric(len(errors), 'lower', 'count')})
+            print(f"  {concurrency:>3} clients: {summary['throughput_rps']:7.2f} req/s   p50 {summary['p50_ms']:8.1f} ms   p99 {summary['p99_ms']:8.1f} ms   errors {len(errors)}")
+    finally:
+        server.shutdown()
+    return results
+
+def compare(baseline, current, threshold, overrides):
+    """Prints every shared metric's change and returns the names that got worse by more than their threshold."""
+    regressions = []
+    print(f"{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}  status")
+    for name, cur in sorted(current['metrics'].items()):
+        base = baseline['metrics'].get(name)
+        if base is None: continue
+        limit = next((value for pattern, value in overrides.items() if fnmatch.fnmatch(name, pattern)), threshold)
+        change = (cur['value'] - base['value']) / base['value'] if base['value'] else (0.0 if cur['value'] == base['value'] else float('inf'))
+        worse = change if cur['better'] == 'lower' else -change
+        status = 'REGRESSION' if worse > limit else 'improved' if worse < -limit else 'ok'
+        if status == 'REGRESSION': regressions.append(name)
+        print(f"{name:<36} {base['value']:>10.2f} {cur['value']:>10.2f} {change:>+8.1%}  {status} (limit {limit:.0%})")
+    return regressions
+
+def parse_overrides(values):
+    overrides = {}
+    for value in values or []:
+        pattern, _, limit = value.rpartition('='); overrides[pattern] = float(limit)
+    return overrides
+
+def git_commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError: return None
+
+def run(args):
+    models = standin_models()
+    with tempfile.TemporaryDirectory() as reports_dir:
+        app_module = start_app(models, reports_dir, args.gemini_delay_ms / 1000)
+        print("Per-stage latency:"); results = bench_stages(app_module, args.iterations)
+        results['memory.after_stages_peak_rss_mb'] = metric(peak_rss_mb(), 'lower', 'MB')
+        print("End-to-end /api/analyze:"); results.update(bench_load(app_module, args.concurrency, args.requests))
+        results['memory.peak_rss_mb'] = metric(peak_rss_mb(), 'lower', 'MB'); print(f"Peak RSS: {results['memory.peak_rss_mb']['value']:.0f} MB")
+        app_module.report_queue.close(); app_module.model_manager.close()
+    output = {'meta': {'commit': git_commit(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0], 'cpus': os.cpu_count(),
+                       'args': {k: v for k, v in vars(args).items() if k not in ('func', 'compare', 'output')}}, 'metrics': results}
+    with open(args.output, 'w') as f: json.dump(output, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        return 1 if compare(baseline, output, args.threshold, parse_overrides(args.metric_threshold)) else 0
+    return 0
+
+def run_compare(args):
+    with open(args.baseline) as f: baseline = json.load(f)
+    with open(args.current) as f: current = json.load(f)
+    print(f"baseline {baseline['meta'].get('commit')} -> current {current['meta'].get('commit')}")
+    return 1 if compare(baseline, current, args.threshold, parse_overrides(args.metric_threshold)) else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and load-test the serving stack with stand-in models.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Run the benchmarks and write a JSON result file.")
+    run_parser.add_argument('--output', type=str, default='bench_serving.json'); run_parser.add_argument('--iterations', type=int, default=20, help="Samples per stage.")
+    run_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16]); run_parser.add_argument('--requests', type=int, default=8, help="Requests per client.")
+    run_parser.add_argument('--gemini-delay-ms', type=float, default=50.0, help="Latency of the fake Gemini client.")
+    run_parser.add_argument('--compare', type=str, default=None, help="Baseline JSON to compare against after the run.")
+    compare_parser = commands.add_parser('compare', help="Compare two JSON result files."); compare_parser.add_argument('baseline'); compare_parser.add_argument('current')
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--threshold', type=float, default=0.10, help="Allowed relative regression for every metric.")
+        sub.add_argument('--metric-threshold', type=str, action='append', help="Per-metric override as GLOB=FRACTION, e.g. 'e2e.*.p99_ms=0.3'.")
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == 'run' else run_compare(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Time-to-ready and memory per gunicorn worker, with and without PRELOAD_MODELS, for the Keras and TFLite backends.
+
+    python benchmarks/bench_startup.py --workers 4 --backend tflite
+    python benchmarks/bench_startup.py --tracking-dir .     # use the real ./mlruns registry instead of stand-in models
+
+Without --tracking-dir, stand-in EfficientNetV2B0 models (random weights, the training head) are registered in a temp
+registry. Memory is read from /proc: Pss splits pages shared copy-on-write between the processes sharing them.
+"""
+import argparse, json, os, subprocess, sys, tempfile, time, urllib.request
+import common
+from config import Config
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def make_registry(tracking_dir):
+    import mlflow, mlflow.keras, tensorflow as tf
+    from tensorflow.keras import layers
+    from utils.tflite_engine import convert_to_tflite
+    mlflow.set_tracking_uri(f"file:{os.path.join(tracking_dir, 'mlruns')}"); client = mlflow.MlflowClient()
+    for model_name, classes in ((Config.MODEL_NAMES['fundus'], Config.FUNDUS_CLASSES), (Config.MODEL_NAMES['oct'], Config.OCT_CLASSES)):
+        inputs = tf.keras.Input(shape=(*Config.IMAGE_SIZE, 3)); x = tf.keras.applications.EfficientNetV2B0(include_top=False, weights=None)(inputs)
+        x = layers.Dropout(0.5)(layers.Dense(256, activation='relu')(layers.BatchNormalization()(layers.GlobalAveragePooling2D()(x))))
+        model = tf.keras.Model(inputs, layers.Dense(len(classes), activation='softmax')(x))
+        with mlflow.start_run(), tempfile.TemporaryDirectory() as tmp:
+            artifact = os.path.join(tmp, 'model_float16.tflite')
+            with open(artifact, 'wb') as f: f.write(convert_to_tflite(model, 'float16'))
+            mlflow.log_artifact(artifact, 'serving'); info = mlflow.keras.log_model(model, 'model', registered_model_name=model_name)
+        client.set_model_version_tag(model_name, info.registered_model_version, 'serving_artifact', 'serving/model_float16.tflite')
+        client.transition_model_version_stage(model_name, info.registered_model_version, 'Production')
+
+def memory_kb(pid):
+    with open(f"/proc/{pid}/smaps_rollup") as f: fields = dict(line.split(':', 1) for line in f if ':' in line)
+    return {k.lower(): int(fields[k].split()[0]) for k in ('Rss', 'Pss')}
+
+def measure(tracking_dir, workers, backend, preload, port, timeout):
+    env = dict(os.environ, SERVING_BACKEND=backend, PRELOAD_MODELS='1' if preload else '0', GEMINI_API_KEY='')
+    command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'), '--pythonpath', BACKEND_DIR,
+               '--bind', f"127.0.0.1:{port}", '--workers', str(workers), '--threads', '4', 'app:app']
+    start = time.perf_counter(); server = subprocess.Popen(command, cwd=tracking_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ready = {}
+    try:
+        while len(ready) < workers:
+            if time.perf_counter() - start > timeout: raise TimeoutError(f"only {len(ready)} of {workers} workers ready after {timeout}s")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/ready", timeout=2) as response: status = json.load(response)
+                ready.setdefault(status['pid'], {'seen_ready_s': round(time.perf_counter() - start, 2), 'model_load_s': status['time_to_ready_s']})
+            except OSError: time.sleep(0.2)
+        for pid, worker in ready.items(): worker.update(memory_kb(pid))
+        return {'backend': backend, 'preload': preload, 'workers': workers, 'all_ready_s': round(time.perf_counter() - start, 2), 'master': memory_kb(server.pid),
+                'total_pss_mb': round((sum(w['pss'] for w in ready.values()) + memory_kb(server.pid)['pss']) / 1024, 1), 'per_worker': list(ready.values())}
+    finally:
+        server.terminate(); server.wait(30)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serving startup.")
+    parser.add_argument('--workers', type=int, default=2); parser.add_argument('--backend', choices=['keras', 'tflite'], nargs='+', default=['keras', 'tflite'])
+    parser.add_argument('--tracking-dir', type=str, default=None, help="Directory containing the mlruns registry to serve.")
+    parser.add_argument('--port', type=int, default=5055); parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        tracking_dir = os.path.abspath(args.tracking_dir) if args.tracking_dir else tmp
+        if not args.tracking_dir: print("Registering stand-in models..."); make_registry(tracking_dir)
+        for backend in args.backend:
+            for preload in (False, True):
+                result = measure(tracking_dir, args.workers, backend, preload, args.port, args.timeout)
+                per_worker = ', '.join(f"{w['rss'] / 1024:.0f}/{w['pss'] / 1024:.0f}" for w in result['per_worker'])
+                print(f"{backend:>6} preload={str(preload):5} all ready {result['all_ready_s']:6.1f}s  total PSS {result['total_pss_mb']:7.1f} MB  per worker RSS/PSS MB: {per_worker}")
+                print(json.dumps(result))
+
+if __name__ == '__main__':
+    main()
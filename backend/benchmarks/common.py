@@ -0,0 +1,22 @@
+import os, sys, time, threading, numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def percentile(values, p): return float(np.percentile(values, p)) if len(values) else 0.0
+
+def run_clients(fn, concurrency, requests_per_client):
+    """Runs `fn(client_id, i)` from `concurrency` threads and returns (per-call latencies in ms, wall time in s)."""
+    latencies, lock, barrier = [], threading.Lock(), threading.Barrier(concurrency + 1)
+    def client(client_id):
+        local = []; barrier.wait()
+        for i in range(requests_per_client):
+            start = time.perf_counter(); fn(client_id, i); local.append((time.perf_counter() - start) * 1000)
+        with lock: latencies.extend(local)
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    for t in threads: t.start()
+    barrier.wait(); start = time.perf_counter()
+    for t in threads: t.join()
+    return latencies, time.perf_counter() - start
+
+def summarize(latencies, wall_time):
+    return {'requests': len(latencies), 'throughput_rps': round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2), 'p99_ms': round(percentile(latencies, 99), 2)}
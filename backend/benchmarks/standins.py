@@ -0,0 +1,41 @@
+"""Stand-ins for the serving stack's external pieces, so benchmarks run anywhere without the registry, real weights or
+network access: tiny Keras models with the real class heads, synthetic fundus/OCT images and a fake Gemini client."""
+import threading, time, cv2, numpy as np
+from config import Config
+
+def standin_model(num_classes, input_size=Config.IMAGE_SIZE, seed=0):
+    """A small CNN shaped like the trained models: a nested conv backbone, then GAP, BatchNorm, Dense/Dropout and a softmax head."""
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(seed)
+    backbone_inputs = tf.keras.Input(shape=(*input_size, 3)); x = tf.keras.layers.Rescaling(1 / 255.0)(backbone_inputs)
+    for filters in (16, 32, 64): x = tf.keras.layers.Conv2D(filters, 3, strides=2, padding='same', activation='swish')(x)
+    backbone = tf.keras.Model(backbone_inputs, x, name='backbone')
+    inputs = tf.keras.Input(shape=(*input_size, 3)); x = tf.keras.layers.GlobalAveragePooling2D()(backbone(inputs))
+    x = tf.keras.layers.Dropout(0.5)(tf.keras.layers.Dense(64, activation='relu')(tf.keras.layers.BatchNormalization()(x)))
+    return tf.keras.Model(inputs, tf.keras.layers.Dense(num_classes, activation='softmax')(x))
+
+def standin_models():
+    return {'fundus': standin_model(len(Config.FUNDUS_CLASSES)), 'oct': standin_model(len(Config.OCT_CLASSES), seed=1)}
+
+def synthetic_fundus(seed, size=(1024, 768)):
+    """JPEG bytes of a fundus-like disc with vessels; every seed gives different bytes (and so a result-cache miss)."""
+    rng = np.random.default_rng(seed); w, h = size; img = np.zeros((h, w, 3), dtype=np.uint8)
+    cv2.circle(img, (w // 2, h // 2), min(w, h) * 9 // 20, tuple(int(c) for c in rng.integers(40, 200, 3)), -1)
+    for _ in range(8): cv2.line(img, (w // 2, h // 2), tuple(int(v) for v in rng.integers(0, min(w, h), 2)), (30, 30, 120), 3)
+    cv2.circle(img, (w // 2 + w // 8, h // 2), min(w, h) // 12, (200, 220, 240), -1)
+    return cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+def synthetic_oct(seed, size=(768, 496)):
+    """PNG bytes of a speckled B-scan with retinal layers."""
+    rng = np.random.default_rng(seed); w, h = size; scan = np.zeros((h, w), dtype=np.float32)
+    scan[h * 2 // 5:h // 2] = 180; scan[h // 2:h * 3 // 5] = 90
+    return cv2.imencode('.png', np.clip(scan * rng.gamma(4.0, 0.25, scan.shape), 0, 255).astype(np.uint8))[1].tobytes()
+
+class FakeGemini:
+    """Stands in for genai.GenerativeModel with a fixed response after `delay` seconds."""
+    def __init__(self, delay=0.0, text="1. IMMEDIATE ACTIONS:\n- Book an ophthalmology review.\n2. LIFESTYLE:\n- Keep HbA1c in range."):
+        self.delay, self.text, self.calls = delay, text, 0; self._lock = threading.Lock()
+    def generate_content(self, prompt, request_options=None):
+        with self._lock: self.calls += 1
+        time.sleep(self.delay)
+        return type('Response', (), {'text': self.text})()
@@ -0,0 +1,146 @@
+"""Rescores a whole dataset tree (dataset/<type>/<split>/<class>/*) with a registered model version.
+
+    python bulk_score.py --type fundus --output ../scores/fundus-v7 --version 7 --gradcam disease --gradcam-limit 200
+
+Preprocessing runs in a process pool with the serving ImageProcessor, inference runs in large batches, and results
+are written part by part (Parquet or CSV) into --output; read them back with read_results(). Re-running the same command skips every image already in a
+written part, so an interrupted run resumes where it stopped; an --output holding another model version or image type is
+refused unless --restart clears it. Grad-CAM overlays are only computed for --gradcam.
+"""
+import os, argparse, base64, glob, shutil, sys, time, numpy as np, pandas as pd
+from collections import deque
+from itertools import islice
+from config import Config
+from dataset_validator import IMAGE_EXTENSIONS
+from utils.batch_analyzer import make_preprocess_pool, try_preprocess_image
+from utils.image_processor import ImageProcessor
+from utils.severity import get_severity
+
+def list_images(dataset_dir, splits=None):
+    """(relative path, split, class) of every image, in a stable order."""
+    images = []
+    for split in sorted(splits or os.listdir(dataset_dir)):
+        split_dir = os.path.join(dataset_dir, split)
+        if not os.path.isdir(split_dir): continue
+        for class_name in sorted(os.listdir(split_dir)):
+            class_dir = os.path.join(split_dir, class_name)
+            if not os.path.isdir(class_dir): continue
+            images.extend((os.path.join(split, class_name, f), split, class_name) for f in sorted(os.listdir(class_dir)) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return images
+
+def _parts(output_dir): return sorted(glob.glob(os.path.join(output_dir, 'part-*.parquet')) + glob.glob(os.path.join(output_dir, 'part-*.csv')))
+
+def _read_part(path, columns=None): return pd.read_parquet(path, columns=columns) if path.endswith('.parquet') else pd.read_csv(path, usecols=columns)
+
+def read_results(output_dir):
+    """All result parts written so far as one DataFrame."""
+    return pd.concat([_read_part(part) for part in _parts(output_dir)], ignore_index=True)
+
+def read_done(output_dir):
+    """Relative paths already written by earlier (possibly interrupted) runs, the next part number, and the
+    (model_version, image_type) pairs those rows were scored with."""
+    parts, done, scored_with = _parts(output_dir), set(), set()
+    for part in parts:
+        frame = _read_part(part, ['path', 'model_version', 'image_type']); done.update(frame['path'])
+        scored_with.update(zip(frame['model_version'].astype(str), frame['image_type'].astype(str)))
+    return done, len(parts), scored_with
+
+def clear_output(output_dir):
+    for part in _parts(output_dir): os.remove(part)
+    shutil.rmtree(os.path.join(output_dir, 'gradcam'), ignore_errors=True)
+
+def write_part(rows, output_dir, index, fmt):
+    path = os.path.join(output_dir, f"part-{index:05d}.{fmt}"); tmp_path = f"{path}.tmp"; frame = pd.DataFrame(rows)
+    if fmt == 'parquet': frame.to_parquet(tmp_path, index=False)
+    else: frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)  # a part either exists complete or not at all, so resume never sees half a chunk
+
+def ordered_map(pool, fn, items, window):
+    """pool.submit over `items` with at most `window` tasks in flight, yielding results in input order."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, *item))
+        if len(pending) >= window: yield pending.popleft().result()
+    while pending: yield pending.popleft().result()
+
+def load_engine(image_type, version=None, stage='Production', tracking_uri='file:./mlruns'):
+    import mlflow, mlflow.keras
+    from utils.grad_cam import GradCamEngine
+    mlflow.set_tracking_uri(tracking_uri); model_name = Config.MODEL_NAMES[image_type]
+    if version is None:
+        latest = mlflow.MlflowClient().get_latest_versions(model_name, stages=[stage])
+        if not latest: raise LookupError(f"Model '{model_name}' has no version in stage '{stage}'.")
+        version = latest[0].version
+    print(f"Loading model '{model_name}' version {version}...")
+    return str(version), GradCamEngine(mlflow.keras.load_model(f"models:/{model_name}/{version}"))
+
+def wants_gradcam(mode, class_name):
+    return mode == 'all' or (mode == 'disease' and class_name != 'normal')
+
+def score_dataset(engine, model_version, dataset_dir, image_type, output_dir, splits=None, workers=None, batch_size=64, chunk_size=2048,
+                  fmt='parquet', gradcam='none', gradcam_limit=None, restart=False):
+    """Scores every image not already written to `output_dir` and returns the number scored in this run. Resuming into
+    results of another model version or image type raises ValueError; `restart` deletes them and starts over."""
+    classes = Config.FUNDUS_CLASSES if image_type == 'fundus' else Config.OCT_CLASSES
+    os.makedirs(output_dir, exist_ok=True)
+    if restart: clear_output(output_dir)
+    done, part, scored_with = read_done(output_dir)
+    if scored_with - {(str(model_version), image_type)}:
+        found = ', '.join(f"{t} v{v}" for v, t in sorted(scored_with))
+        raise ValueError(f"{output_dir} holds results scored with {found}, not {image_type} v{model_version}; use another --output or --restart.")
+    todo = [image for image in list_images(dataset_dir, splits) if image[0] not in done]
+    gradcams = sum(1 for f in glob.glob(os.path.join(output_dir, 'gradcam', '**', '*.jpg'), recursive=True))
+    print(f"{len(todo)} images to score ({len(done)} already done).")
+    image_processor, scored, start = ImageProcessor(Config.DECODE_MIN_SIDE, Config.OCT_ENHANCE_MODE), 0, time.perf_counter()
+    with make_preprocess_pool(workers, Config.DECODE_MIN_SIDE, Config.OCT_ENHANCE_MODE) as pool:
+        results = ordered_map(pool, try_preprocess_image, ((os.path.join(dataset_dir, path), image_type) for path, _, _ in todo), window=4 * batch_size)
+        for chunk_start in range(0, len(todo), chunk_size):
+            chunk, rows = todo[chunk_start:chunk_start + chunk_size], []
+            for batch_start in range(0, len(chunk), batch_size):
+                batch = chunk[batch_start:batch_start + batch_size]; preprocessed = list(islice(results, len(batch)))
+                ok = [i for i, (array, _) in enumerate(preprocessed) if array is not None]
+                probabilities = engine.predict(np.stack([preprocessed[i][0] for i in ok])) if ok else []
+                explain = [i for i, p in zip(ok, probabilities) if wants_gradcam(gradcam, classes[int(np.argmax(p))])]
+                explain = explain[:max(0, gradcam_limit - gradcams)] if gradcam_limit is not None else explain
+                cams = dict(zip(explain, engine.explain(np.stack([preprocessed[i][0] for i in explain]))[1])) if explain else {}
+                probs_by_index = dict(zip(ok, probabilities))
+                for i, (path, split, true_class) in enumerate(batch):
+                    row = {'path': path, 'split': split, 'true_class': true_class, 'image_type': image_type, 'model_version': model_version,
+                           'predicted_class': None, 'confidence': None, 'severity': None, 'gradcam_path': None, 'error': preprocessed[i][1], **{f"prob_{c}": None for c in classes}}
+                    if i in probs_by_index:
+                        p = probs_by_index[i]; row['predicted_class'] = classes[int(np.argmax(p))]; row['confidence'] = float(np.max(p))
+                        row['severity'] = get_severity(row['predicted_class'], row['confidence'], image_type)
+                        row.update({f"prob_{c}": float(v) for c, v in zip(classes, p)})
+                    if i in cams:
+                        row['gradcam_path'] = os.path.join('gradcam', os.path.splitext(path)[0] + '.jpg'); gradcam_file = os.path.join(output_dir, row['gradcam_path'])
+                        os.makedirs(os.path.dirname(gradcam_file), exist_ok=True)
+                        with open(gradcam_file, 'wb') as f: f.write(base64.b64decode(image_processor.overlay_heatmap(preprocessed[i][0], cams[i])))
+                        gradcams += 1
+                    rows.append(row)
+            write_part(rows, output_dir, part, fmt); part += 1; scored += len(rows)
+            print(f"  {scored}/{len(todo)} scored, {scored / (time.perf_counter() - start):.1f} images/s")
+    return scored
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore a dataset tree with a registered model version.")
+    parser.add_argument('--type', type=str, required=True, choices=['fundus', 'oct'])
+    parser.add_argument('--dataset', type=str, default=None, help="Dataset root (default: ../dataset/<type>).")
+    parser.add_argument('--splits', type=str, nargs='+', default=None, help="Splits to score (default: all).")
+    parser.add_argument('--output', type=str, required=True, help="Directory for result parts and Grad-CAM overlays.")
+    parser.add_argument('--format', type=str, default='parquet', choices=['parquet', 'csv'])
+    parser.add_argument('--version', type=str, default=None, help="Model version (default: latest in --stage).")
+    parser.add_argument('--stage', type=str, default='Production')
+    parser.add_argument('--tracking-uri', type=str, default='file:./mlruns')
+    parser.add_argument('--workers', type=int, default=None, help="Preprocessing processes (default: all cores).")
+    parser.add_argument('--batch-size', type=int, default=64); parser.add_argument('--chunk-size', type=int, default=2048, help="Images per written part (the resume granularity).")
+    parser.add_argument('--gradcam', type=str, default='none', choices=['none', 'disease', 'all'], help="Which predictions get a Grad-CAM overlay.")
+    parser.add_argument('--gradcam-limit', type=int, default=None, help="At most this many Grad-CAM overlays in total.")
+    parser.add_argument('--restart', action='store_true', help="Delete existing results in --output instead of resuming.")
+    args = parser.parse_args()
+    dataset_dir = args.dataset or os.path.join('..', 'dataset', args.type)
+    if not os.path.isdir(dataset_dir):
+        print(f"FATAL ERROR: Data directory not found at {os.path.abspath(dataset_dir)}"); sys.exit(1)
+    version, engine = load_engine(args.type, args.version, args.stage, args.tracking_uri)
+    try: score_dataset(engine, version, dataset_dir, args.type, args.output, args.splits, args.workers, args.batch_size, args.chunk_size, args.format, args.gradcam, args.gradcam_limit, args.restart)
+    except ValueError as e:
+        print(f"FATAL ERROR: {e}"); sys.exit(1)
@@ -2,11 +2,33 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
-    UPLOAD_FOLDER = os.path.abspath('temp')
     REPORTS_FOLDER = os.path.abspath('../reports')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 200 * 1024 * 1024))
+    BATCH_MAX_INFLIGHT = int(os.environ.get('BATCH_MAX_INFLIGHT', 32))
+    PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', os.cpu_count() or 1))
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    REPORT_QUEUE_SIZE = int(os.environ.get('REPORT_QUEUE_SIZE', 64))
+    REPORT_RETENTION = int(os.environ.get('REPORT_RETENTION', 3600))
+    REPORT_DOWNLOAD_WAIT = float(os.environ.get('REPORT_DOWNLOAD_WAIT', 30))
     IMAGE_SIZE = (224, 224)
+    DECODE_MIN_SIDE = int(os.environ.get('DECODE_MIN_SIDE', 0))
+    OCT_ENHANCE_MODE = os.environ.get('OCT_ENHANCE_MODE', 'full')
+    RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', 64))
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 3600))
+    SERVING_BACKEND = os.environ.get('SERVING_BACKEND', 'keras')
+    MODEL_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', 300))
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    TFLITE_THREADS = int(os.environ.get('TFLITE_THREADS', os.cpu_count() or 1))
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 16))
+    BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+    PROFILE_MODE = os.environ.get('PROFILE_MODE')
+    PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.abspath('profiles'))
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+    GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 20))
+    EXPLANATION_CACHE_PATH = os.environ.get('EXPLANATION_CACHE_PATH', os.path.abspath('cache/explanations.json'))
+    MODEL_NAMES = {'fundus': 'fundus-model', 'oct': 'oct-model'}
     FUNDUS_MODEL_PATH = 'models/fundus_model.h5'
     FUNDUS_CLASSES = ['normal', 'diabetic_retinopathy', 'cataracts', 'glaucoma']
     OCT_MODEL_PATH = 'models/oct_model.h5'
@@ -0,0 +1,124 @@
+import os, json, hashlib, numpy as np, pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg')
+CHUNK_SIZE = 1024 * 1024
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.validation_cache')
+_DCT = np.cos(np.pi / 32 * (np.arange(32)[:, None] * (np.arange(32)[None, :] + 0.5)))
+
+def _bits_to_int(bits): return int(''.join('1' if b else '0' for b in bits.flatten()), 2)
+
+def perceptual_hashes(img):
+    """64-bit pHash (8x8 low-frequency DCT block vs. its median) and dHash (horizontal gradient signs) of a PIL image."""
+    img.draft('L', (64, 64)); gray = img.convert('L')
+    small = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ small @ _DCT.T)[:8, :8]
+    diff = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(low > np.median(low)), _bits_to_int(diff[:, 1:] > diff[:, :-1])
+
+def scan_file(path):
+    """Opens an image once: verifies it, hashes it in chunks and computes its perceptual hashes."""
+    result = {'md5': None, 'phash': None, 'dhash': None, 'error': None}
+    try:
+        with open(path, 'rb') as f:
+            with Image.open(f) as img: img.verify()
+            f.seek(0); digest = hashlib.md5()
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''): digest.update(chunk)
+            result['md5'] = digest.hexdigest(); f.seek(0)
+            with Image.open(f) as img: result['phash'], result['dhash'] = perceptual_hashes(img)
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+def _cache_file(directory):
+    return os.path.join(CACHE_DIR, hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:16] + '.json')
+
+def scan_dataset(directory, workers=None, cache_path=None):
+    """Scans every image under `directory`/<class>/ in a process pool. Per-file results are cached by (path, size, mtime),
+    so re-runs only read files that changed. Returns a list of records sorted by path."""
+    cache_path = cache_path or _cache_file(directory)
+    try:
+        with open(cache_path, 'r') as f: cache = json.load(f)
+    except (OSError, ValueError): cache = {}
+    records, to_scan = [], []
+    for class_name in sorted(os.listdir(directory)):
+        class_path = os.path.join(directory, class_name)
+        if not os.path.isdir(class_path): continue
+        for entry in sorted(os.scandir(class_path), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS): continue
+            stat = entry.stat(); rel_path = os.path.join(class_name, entry.name)
+            record = {'path': rel_path, 'class': class_name, 'filename': entry.name, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+            cached = cache.get(rel_path)
+            if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns: record.update(cached)
+            else: to_scan.append(record)
+            records.append(record)
+    if to_scan:
+        print(f"  Scanning {len(to_scan)} new or changed files ({len(records) - len(to_scan)} cached)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for record, result in zip(to_scan, pool.map(scan_file, [os.path.join(directory, r['path']) for r in to_scan], chunksize=64)): record.update(result)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True); tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w') as f: json.dump({r['path']: {k: r[k] for k in ('size', 'mtime', 'md5', 'phash', 'dhash', 'error')} for r in records}, f)
+        os.replace(tmp_path, cache_path)
+    return records
+
+class PerceptualIndex:
+    """Finds hashes within `max_distance` bits without comparing every pair: the 64 bits are split into
+    max_distance + 1 bands, and by pigeonhole any match within the distance shares at least one band exactly."""
+    def __init__(self, max_distance=4):
+        self.max_distance = max_distance; bands = max_distance + 1
+        edges = np.linspace(0, 64, bands + 1).astype(int); self._bands = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(edges[:-1], edges[1:])]
+        self._buckets = {}; self._items = []
+
+    def add(self, phash, dhash, item):
+        self._items.append((phash, dhash, item)); index = len(self._items) - 1
+        for band, (shift, mask) in enumerate(self._bands): self._buckets.setdefault((band, (phash >> shift) & mask), []).append(index)
+
+    def query(self, phash, dhash):
+        candidates = set()
+        for band, (shift, mask) in enumerate(self._bands): candidates.update(self._buckets.get((band, (phash >> shift) & mask), ()))
+        return [(self._items[i][2], (phash ^ self._items[i][0]).bit_count()) for i in sorted(candidates)
+                if (phash ^ self._items[i][0]).bit_count() <= self.max_distance and (dhash ^ self._items[i][1]).bit_count() <= self.max_distance]
+
+def validate_dataset(directory, workers=None, near_duplicate_distance=4, cache_path=None):
+    print(f"\n--- Starting Validation for: {directory} ---")
+    records = scan_dataset(directory, workers, cache_path)
+    stats, seen_hashes, is_valid, index = {}, {}, True, PerceptualIndex(near_duplicate_distance)
+    for record in records:
+        counts = stats.setdefault(record['class'], {"Class": record['class'], "Valid": 0, "Corrupted": 0, "Duplicates": 0, "NearDuplicates": 0})
+        if record['error']:
+            print(f"  [CORRUPTED] {record['filename']}: {record['error']}"); counts['Corrupted'] += 1; is_valid = False; continue
+        if record['md5'] in seen_hashes:
+            print(f"  [DUPLICATE] {record['filename']} is a duplicate of {seen_hashes[record['md5']]}")
+            counts['Duplicates'] += 1; is_valid = False; continue
+        seen_hashes[record['md5']] = record['filename']; counts['Valid'] += 1
+        matches = index.query(record['phash'], record['dhash'])
+        if matches:
+            print(f"  [NEAR-DUPLICATE] {record['path']} resembles {matches[0][0]} (distance {matches[0][1]})"); counts['NearDuplicates'] += 1
+        index.add(record['phash'], record['dhash'], record['path'])
+    print("\n--- DATASET VALIDATION SUMMARY ---"); print(pd.DataFrame(list(stats.values())).to_string(index=False))
+    if not is_valid: print("\n❌ Validation Failed: Please clean the dataset.")
+    else: print("\n✅ Validation Passed.")
+    return is_valid
+
+def check_leakage(train_directory, validation_directory, workers=None, max_distance=4, fail_on_near_duplicates=False):
+    """Fails when a validation image is a byte-identical copy of a training image. Perceptual matches within
+    `max_distance` bits are only warnings unless `fail_on_near_duplicates`: fundus photos share so much structure
+    (dark border, centred disc) that unrelated images can hash close together."""
+    print(f"\n--- Checking train/validation leakage ---")
+    index = PerceptualIndex(max_distance); train_md5 = {}
+    for record in scan_dataset(train_directory, workers):
+        if record['error']: continue
+        index.add(record['phash'], record['dhash'], record['path']); train_md5.setdefault(record['md5'], record['path'])
+    leaks, near = 0, 0
+    for record in scan_dataset(validation_directory, workers):
+        if record['error']: continue
+        if record['md5'] in train_md5:
+            print(f"  [LEAKAGE] validation/{record['path']} is identical to train/{train_md5[record['md5']]}"); leaks += 1; continue
+        matches = index.query(record['phash'], record['dhash'])
+        if matches: print(f"  [NEAR-LEAKAGE] validation/{record['path']} resembles train/{matches[0][0]} (distance {matches[0][1]})"); near += 1
+    if near: print(f"\n⚠️  {near} validation images resemble training images (within {max_distance} bits); review them.")
+    failed = leaks + (near if fail_on_near_duplicates else 0)
+    if failed: print(f"\n❌ Leakage Check Failed: {leaks} identical{f' and {near} near-duplicate' if fail_on_near_duplicates and near else ''} validation images also appear in training.")
+    else: print("\n✅ Leakage Check Passed.")
+    return failed == 0
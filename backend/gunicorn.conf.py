@@ -0,0 +1,21 @@
+import os
+
+# PRELOAD_MODELS=1 imports the app and fetches the models once in the master. TFLite artifacts read there are shared
+# copy-on-write by every worker, which only builds and warms up its engines. No TensorFlow op may run before fork.
+# A worker uses a prefetched source only while the registry still serves that version, so workers respawned after a
+# promotion load the new one. SIGHUP to the master replaces every worker, which reloads all of them at once.
+preload_app = os.environ.get('PRELOAD_MODELS') == '1'
+
+def when_ready(server):
+    if preload_app:
+        from app import model_manager
+        model_manager.prefetch()
+
+def post_worker_init(worker):
+    from app import start_background_tasks
+    start_background_tasks()
+
+def worker_exit(server, worker):
+    import app
+    app.gemini_api.close(); app.report_queue.close(); app.model_manager.close()
+    if app.preprocess_pool is not None: app.preprocess_pool.shutdown(cancel_futures=True)
@@ -1,46 +1,84 @@
-import os, argparse, sys, hashlib, mlflow, mlflow.keras, numpy as np, pandas as pd, tensorflow as tf
+import os, argparse, hashlib, json, sys, time, tempfile, mlflow, mlflow.keras, numpy as np, tensorflow as tf
 from tensorflow.keras import layers, models
 from tensorflow.keras.applications import EfficientNetV2B0
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.metrics import accuracy_score
-from PIL import Image
+from config import Config
+from dataset_validator import validate_dataset, check_leakage, IMAGE_EXTENSIONS
+from utils.image_processor import ImageProcessor
+from utils.grad_cam import GradCamEngine
+from utils.tflite_engine import QUANTIZATION_MODES, TFLiteEngine, convert_to_tflite
 
-def validate_dataset(directory):
-    print(f"\n--- Starting Validation for: {directory} ---")
-    stats, seen_hashes, is_valid = [], {}, True
-    for class_name in sorted(os.listdir(directory)):
-        class_path = os.path.join(directory, class_name)
-        if not os.path.isdir(class_path): continue
-        valid_count, corrupted_count, duplicate_count = 0, 0, 0
-        image_files = [f for f in os.listdir(class_path) if f.lower().endswith(('png', 'jpg', 'jpeg'))]
-        for filename in image_files:
-            filepath = os.path.join(class_path, filename)
-            try:
-                with Image.open(filepath) as img: img.verify()
-                with open(filepath, 'rb') as f: file_hash = hashlib.md5(f.read()).hexdigest()
-                if file_hash in seen_hashes:
-                    print(f"  [DUPLICATE] {filename} is a duplicate of {seen_hashes[file_hash]}")
-                    duplicate_count += 1; is_valid = False
-                else:
-                    seen_hashes[file_hash] = filename; valid_count += 1
-            except Exception as e:
-                print(f"  [CORRUPTED] {filename}: {e}"); corrupted_count += 1; is_valid = False
-        stats.append({"Class": class_name, "Valid": valid_count, "Corrupted": corrupted_count, "Duplicates": duplicate_count})
-    print("\n--- DATASET VALIDATION SUMMARY ---"); print(pd.DataFrame(stats).to_string(index=False))
-    if not is_valid: print("\n❌ Validation Failed: Please clean the dataset.")
-    else: print("\n✅ Validation Passed.")
-    return is_valid
+AUTOTUNE = tf.data.AUTOTUNE
 
 class EyeDiseaseModelTrainer:
     def __init__(self, config):
         self.config = config; self.img_size = (224, 224); self.batch_size = 32
         self.num_classes = len(config['classes']); self.model = None; self.base_model = None
     def prepare_data(self):
-        train_datagen = ImageDataGenerator(rotation_range=20, width_shift_range=0.2, height_shift_range=0.2, horizontal_flip=True, zoom_range=0.2, shear_range=0.2, fill_mode='nearest', preprocessing_function=tf.keras.applications.efficientnet_v2.preprocess_input)
-        val_datagen = ImageDataGenerator(preprocessing_function=tf.keras.applications.efficientnet_v2.preprocess_input)
-        self.train_generator = train_datagen.flow_from_directory(os.path.join(self.config['dataset_path'], 'train'), target_size=self.img_size, batch_size=self.batch_size, class_mode='categorical', shuffle=True, classes=self.config['classes'])
-        self.val_generator = val_datagen.flow_from_directory(os.path.join(self.config['dataset_path'], 'validation'), target_size=self.img_size, batch_size=self.batch_size, class_mode='categorical', shuffle=False, classes=self.config['classes'])
+        # Same decode + CLAHE/denoise path as serving, run in parallel and cached as resized uint8 tensors.
+        self.image_processor = ImageProcessor(Config.DECODE_MIN_SIDE, Config.OCT_ENHANCE_MODE)
+        self.augment = tf.keras.Sequential([layers.RandomRotation(20 / 360, fill_mode='nearest'), layers.RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+                                            layers.RandomFlip('horizontal'), layers.RandomZoom(0.2, fill_mode='nearest')], name='augmentation')
+        self.train_ds = self._build_dataset('train', training=True)
+        self.val_ds = self._build_dataset('validation', training=False)
+    def _list_split(self, split):
+        paths, labels = [], []
+        for label, class_name in enumerate(self.config['classes']):
+            class_path = os.path.join(self.config['dataset_path'], split, class_name)
+            for filename in sorted(os.listdir(class_path)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS): paths.append(os.path.join(class_path, filename)); labels.append(label)
+        return paths, labels
+    def _fingerprint(self, split):
+        """Short hash of the split's files (path, size, mtime) and of every setting that changes the preprocessed tensors;
+        it names the tensor cache and the TFRecord shards, so a changed dataset or config never reuses stale ones."""
+        paths, labels = self._list_split(split); files = [(os.path.relpath(p, self.config['dataset_path']), os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths]
+        settings = {'type': self.config['type'], 'classes': self.config['classes'], 'img_size': self.img_size, 'target_size': self.image_processor.target_size,
+                    'decode_min_side': Config.DECODE_MIN_SIDE, 'oct_enhance_mode': Config.OCT_ENHANCE_MODE}
+        return hashlib.sha1(json.dumps([settings, files, labels], default=list).encode()).hexdigest()[:12]
+    def _preprocess_path(self, path):
+        path = path.decode() if isinstance(path, bytes) else path
+        return self.image_processor.preprocess_fundus(path) if self.config['type'] == 'fundus' else self.image_processor.enhance_oct(path)
+    def _decoded_dataset(self, split, deterministic=True, from_tfrecords=True):
+        """Unbatched (uint8 image, class index) pairs, read from TFRecord shards when shards matching the split's fingerprint exist."""
+        tfrecord_dir = self.config.get('tfrecord_dir')
+        if from_tfrecords and tfrecord_dir:
+            pattern = os.path.join(tfrecord_dir, f"{split}-{self._fingerprint(split)}-*.tfrecord")
+            if tf.io.gfile.glob(pattern):
+                files = tf.data.Dataset.list_files(pattern, shuffle=False)
+                return files.interleave(tf.data.TFRecordDataset, num_parallel_calls=AUTOTUNE, deterministic=deterministic).map(self._parse_example, num_parallel_calls=AUTOTUNE)
+            if tf.io.gfile.glob(os.path.join(tfrecord_dir, f"{split}-*.tfrecord")):
+                print(f"--- Ignoring stale {split} TFRecord shards in {tfrecord_dir}: the dataset or preprocessing config changed; re-export them ---")
+        paths, labels = self._list_split(split)
+        def load(path, label):
+            image = tf.numpy_function(self._preprocess_path, [path], tf.uint8); image.set_shape((*self.img_size, 3))
+            return image, label
+        return tf.data.Dataset.from_tensor_slices((paths, labels)).map(load, num_parallel_calls=AUTOTUNE, deterministic=deterministic)
+    def _build_dataset(self, split, training):
+        ds = self._decoded_dataset(split, deterministic=not training)
+        cache_dir = self.config.get('cache_dir')
+        if cache_dir:  # no in-memory fallback: the decoded tensors of a full dataset do not fit in RAM
+            os.makedirs(cache_dir, exist_ok=True); ds = ds.cache(os.path.join(cache_dir, f"{self.config['type']}_{split}_{self._fingerprint(split)}"))
+        if training: ds = ds.shuffle(2048, reshuffle_each_iteration=True)
+        ds = ds.batch(self.batch_size).map(lambda x, y: (tf.cast(x, tf.float32), tf.one_hot(y, self.num_classes)), num_parallel_calls=AUTOTUNE)
+        if training: ds = ds.map(lambda x, y: (self.augment(x, training=True), y), num_parallel_calls=AUTOTUNE)
+        return ds.map(lambda x, y: (tf.keras.applications.efficientnet_v2.preprocess_input(x), y), num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+    def _parse_example(self, record):
+        features = tf.io.parse_single_example(record, {'image': tf.io.FixedLenFeature([], tf.string), 'label': tf.io.FixedLenFeature([], tf.int64)})
+        image = tf.reshape(tf.io.decode_raw(features['image'], tf.uint8), (*self.img_size, 3))
+        return image, tf.cast(features['label'], tf.int32)
+    def export_tfrecords(self, output_dir, num_shards=16):
+        """Writes the preprocessed train/validation tensors as sharded TFRecords that later runs read instead of the JPEGs."""
+        os.makedirs(output_dir, exist_ok=True)
+        for split in ('train', 'validation'):
+            fingerprint = self._fingerprint(split)
+            writers = [tf.io.TFRecordWriter(os.path.join(output_dir, f"{split}-{fingerprint}-{i:05d}-of-{num_shards:05d}.tfrecord")) for i in range(num_shards)]
+            for i, (image, label) in enumerate(self._decoded_dataset(split, from_tfrecords=False).as_numpy_iterator()):
+                example = tf.train.Example(features=tf.train.Features(feature={'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+                                                                               'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)]))}))
+                writers[i % num_shards].write(example.SerializeToString())
+            for writer in writers: writer.close()
+            print(f"--- Exported {split} split to {num_shards} TFRecord shards in {output_dir} ---")
     def build_model(self):
         self.base_model = EfficientNetV2B0(input_shape=(*self.img_size, 3), include_top=False, weights='imagenet')
         self.base_model.trainable = False
@@ -49,29 +87,69 @@ class EyeDiseaseModelTrainer:
         x = layers.Dense(256, activation='relu')(x); x = layers.Dropout(0.5)(x)
         outputs = layers.Dense(self.num_classes, activation='softmax')(x)
         self.model = models.Model(inputs, outputs)
-    def train(self, epochs=25, fine_tune_epochs=15):
+    def _mean_latency_ms(self, engine, images, repeats=20):
+        engine.explain(images[:1]); start = time.perf_counter()
+        for i in range(repeats): engine.explain(images[i % len(images)][None])
+        return (time.perf_counter() - start) / repeats * 1000
+    def export_serving_artifact(self, quantization, keras_accuracy, y_true, max_accuracy_drop, calibration_batches=8):
+        """Converts the trained model to a TFLite serving artifact (int8 calibrated on validation images), then logs its
+        accuracy delta and single-image latency against Keras to the active run. Returns (artifact path, within tolerance)."""
+        calibration = lambda: (image for x, _ in self.val_ds.take(calibration_batches).as_numpy_iterator() for image in x)
+        artifact_path = f"serving/{self.config['type']}_{quantization}.tflite"
+        with tempfile.TemporaryDirectory() as tmp:
+            local_path = os.path.join(tmp, os.path.basename(artifact_path))
+            with open(local_path, 'wb') as f: f.write(convert_to_tflite(self.model, quantization, calibration() if quantization == 'int8' else None))
+            engine = TFLiteEngine(local_path)
+            y_pred = np.concatenate([np.argmax(engine.predict(x), axis=1) for x, _ in self.val_ds.as_numpy_iterator()])
+            images = next(self.val_ds.as_numpy_iterator())[0]
+            report = {'quantization': quantization, 'keras_accuracy': keras_accuracy, 'serving_accuracy': accuracy_score(y_true, y_pred),
+                      'keras_latency_ms': self._mean_latency_ms(GradCamEngine(self.model), images), 'serving_latency_ms': self._mean_latency_ms(engine, images),
+                      'serving_size_mb': os.path.getsize(local_path) / 1024 / 1024, 'max_accuracy_drop': max_accuracy_drop}
+            report['accuracy_delta'] = report['serving_accuracy'] - keras_accuracy
+            report['within_tolerance'] = -report['accuracy_delta'] <= max_accuracy_drop
+            mlflow.log_artifact(local_path, artifact_path='serving'); mlflow.log_dict(report, 'serving/report.json')
+        mlflow.log_metrics({k: report[k] for k in ('serving_accuracy', 'accuracy_delta', 'keras_latency_ms', 'serving_latency_ms', 'serving_size_mb')})
+        mlflow.set_tag('serving_within_tolerance', str(report['within_tolerance']).lower())
+        print(f"--- Serving artifact ({quantization}): accuracy {report['serving_accuracy']:.4f} (delta {report['accuracy_delta']:+.4f}), "
+              f"latency {report['serving_latency_ms']:.1f} ms vs {report['keras_latency_ms']:.1f} ms Keras ---")
+        return artifact_path, report['within_tolerance']
+    def train(self, epochs=25, fine_tune_epochs=15, serving_quantization=None, max_accuracy_drop=0.01):
         mlflow.set_experiment(self.config['experiment_name'])
         with mlflow.start_run() as run:
             print(f"--- Starting MLflow Run: {run.info.run_id} ---")
             mlflow.log_params({"model_type": self.config['type'], "image_size": self.img_size[0], "batch_size": self.batch_size})
             self.model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.001), loss='categorical_crossentropy', metrics=['accuracy'])
-            self.model.fit(self.train_generator, epochs=epochs, validation_data=self.val_generator, callbacks=[EarlyStopping(patience=10, restore_best_weights=True)], verbose=1)
+            self.model.fit(self.train_ds, epochs=epochs, validation_data=self.val_ds, callbacks=[EarlyStopping(patience=10, restore_best_weights=True)], verbose=1)
             self.base_model.trainable = True
             for layer in self.base_model.layers[:-30]: layer.trainable = False
             self.model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5), loss='categorical_crossentropy', metrics=['accuracy'])
-            self.model.fit(self.train_generator, epochs=fine_tune_epochs, validation_data=self.val_generator, verbose=1)
-            predictions = self.model.predict(self.val_generator); y_pred = np.argmax(predictions, axis=1); y_true = self.val_generator.labels
+            self.model.fit(self.train_ds, epochs=fine_tune_epochs, validation_data=self.val_ds, verbose=1)
+            predictions = self.model.predict(self.val_ds); y_pred = np.argmax(predictions, axis=1)
+            y_true = np.concatenate([np.argmax(y, axis=1) for _, y in self.val_ds.as_numpy_iterator()])
             accuracy = accuracy_score(y_true, y_pred); mlflow.log_metric("val_accuracy", accuracy)
-            mlflow.keras.log_model(self.model, artifact_path="model", registered_model_name=self.config['registered_model_name'])
+            serving = self.export_serving_artifact(serving_quantization, accuracy, y_true, max_accuracy_drop) if serving_quantization else None
+            model_info = mlflow.keras.log_model(self.model, artifact_path="model", registered_model_name=self.config['registered_model_name'])
+            if serving and serving[1]:
+                # Only artifacts within tolerance are attached to the registered version, so promoting it promotes them together.
+                mlflow.MlflowClient().set_model_version_tag(self.config['registered_model_name'], model_info.registered_model_version, 'serving_artifact', serving[0])
+            elif serving: print(f"--- Serving artifact exceeds the {max_accuracy_drop:.2%} accuracy tolerance; not attaching it to the registered model ---")
             print(f"--- Final Validation Accuracy: {accuracy:.4f} ---"); print("--- MLflow Run Complete ---")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Validate and train an eye disease model.")
     parser.add_argument('--type', type=str, required=True, choices=['fundus', 'oct'])
+    parser.add_argument('--workers', type=int, default=None, help="Processes for dataset validation (default: all cores).")
+    parser.add_argument('--near-duplicate-distance', type=int, default=4, help="Max pHash/dHash bit distance reported as a near duplicate.")
+    parser.add_argument('--fail-on-near-leakage', action='store_true', help="Also refuse to train when validation images only resemble training images.")
+    parser.add_argument('--cache-dir', type=str, default=None, help="Cache preprocessed tensors to files here (default: no cache).")
+    parser.add_argument('--tfrecord-dir', type=str, default=None, help="Read preprocessed TFRecord shards from here when present.")
+    parser.add_argument('--export-tfrecords', action='store_true', help="Write preprocessed TFRecord shards to --tfrecord-dir before training.")
+    parser.add_argument('--serving-quantization', type=str, default='float16', choices=['none', *QUANTIZATION_MODES], help="Optimized TFLite serving artifact to export after training.")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01, help="Largest validation accuracy loss allowed for the serving artifact.")
     args = parser.parse_args()
     model_configs = {
-        'fundus': {'type': 'fundus', 'dataset_path': '../dataset/fundus', 'experiment_name': 'Diabetic Eye - Fundus', 'registered_model_name': 'fundus-model', 'classes': ['normal', 'diabetic_retinopathy', 'cataracts', 'glaucoma']},
-        'oct': {'type': 'oct', 'dataset_path': '../dataset/oct', 'experiment_name': 'Diabetic Eye - OCT', 'registered_model_name': 'oct-model', 'classes': ['normal', 'macular_edema']}
+        'fundus': {'type': 'fundus', 'dataset_path': '../dataset/fundus', 'experiment_name': 'Diabetic Eye - Fundus', 'registered_model_name': Config.MODEL_NAMES['fundus'], 'classes': ['normal', 'diabetic_retinopathy', 'cataracts', 'glaucoma']},
+        'oct': {'type': 'oct', 'dataset_path': '../dataset/oct', 'experiment_name': 'Diabetic Eye - OCT', 'registered_model_name': Config.MODEL_NAMES['oct'], 'classes': ['normal', 'macular_edema']}
     }
     config = model_configs[args.type]
     train_path = os.path.join(config['dataset_path'], 'train')
@@ -79,8 +157,14 @@ if __name__ == "__main__":
     if not os.path.exists(train_path) or not os.path.exists(validation_path):
         print(f"FATAL ERROR: Data directory not found at {os.path.abspath(config['dataset_path'])}")
         sys.exit(1)
-    if validate_dataset(train_path) and validate_dataset(validation_path):
+    if all([validate_dataset(train_path, args.workers, args.near_duplicate_distance), validate_dataset(validation_path, args.workers, args.near_duplicate_distance),
+            check_leakage(train_path, validation_path, args.workers, args.near_duplicate_distance, args.fail_on_near_leakage)]):
         print(f"\n--- Proceeding with training for model type: {args.type.upper()} ---")
-        trainer = EyeDiseaseModelTrainer(config); trainer.prepare_data(); trainer.build_model(); trainer.train()
+        config.update({'cache_dir': args.cache_dir, 'tfrecord_dir': args.tfrecord_dir}); trainer = EyeDiseaseModelTrainer(config)
+        if args.export_tfrecords:
+            if not args.tfrecord_dir: print("FATAL ERROR: --export-tfrecords needs --tfrecord-dir"); sys.exit(1)
+            trainer.prepare_data(); trainer.export_tfrecords(args.tfrecord_dir)
+        trainer.prepare_data(); trainer.build_model()
+        trainer.train(serving_quantization=None if args.serving_quantization == 'none' else args.serving_quantization, max_accuracy_drop=args.max_accuracy_drop)
     else:
         print("\n--- Halting execution due to data validation errors. ---"); sys.exit(1)
@@ -1,5 +1,7 @@
-import pytest, sys, os
+import pytest, sys, os, io, json, zipfile
+from concurrent.futures import Future
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app as app_module
 from app import app
 
 @pytest.fixture
@@ -21,3 +23,68 @@ def test_analyze_no_image(client):
     assert response.status_code == 400
     json_data = response.get_json()
     assert 'error' in json_data
+
+def test_analyze_reads_upload_from_memory(client, monkeypatch):
+    """Uploaded images are handed to predict() as in-memory buffers, not saved to disk."""
+    seen = {}
+    def fake_predict(model, image_data, image_type, class_list):
+        seen[image_type] = bytes(image_data); return 'normal', 0.9, 'No Disease Detected', None, None
+    monkeypatch.setattr(app_module, 'predict', fake_predict)
+    recommendations = Future(); recommendations.set_result('None')
+    monkeypatch.setattr(app_module.gemini_api, 'get_recommendations_async', lambda patient, results: recommendations)
+    monkeypatch.setattr(app_module.report_queue, 'submit', lambda patient, results, recs: 'job-id')
+    response = client.post('/api/analyze?timings=1', data={'name': 'Test', 'fundusImage': (io.BytesIO(b'fake-jpeg-bytes'), 'eye.jpg')}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert seen == {'fundus': b'fake-jpeg-bytes'}
+    assert {'upload', 'recommendations_wait'} <= set(response.get_json()['timings_ms'])
+
+def test_report_status_and_download(client, tmp_path, monkeypatch):
+    """Reports are built in the background, polled by ID and downloaded once ready."""
+    monkeypatch.setitem(app_module.app.config, 'REPORTS_FOLDER', str(tmp_path))
+    monkeypatch.setattr(app_module.pdf_generator, 'reports_dir', str(tmp_path))
+    results = {'fundus': {'disease': 'glaucoma', 'confidence': 81.5, 'severity': 'Severe'}}
+    report_id = app_module.report_queue.submit({'name': 'Test Patient'}, results, "1. IMMEDIATE ACTIONS:\n- See a doctor.")
+    response = client.get(f'/api/download-report/{report_id}')
+    assert response.status_code == 200 and response.data.startswith(b'%PDF')
+    status = client.get(f'/api/report-status/{report_id}').get_json()
+    assert status['status'] == 'ready' and status['download_url'] == f'/api/download-report/{report_id}'
+    monkeypatch.setattr(app_module.report_queue, '_jobs', {})  # as seen by a worker that did not build it
+    assert client.get(f'/api/download-report/{report_id}').data.startswith(b'%PDF')
+    assert client.get('/api/report-status/unknown').status_code == 404
+
+def test_analyze_batch_streams_ndjson(client, monkeypatch):
+    """Loose files and zip members are analyzed and streamed back one JSON line each, skipped entries as errors, then a summary."""
+    monkeypatch.setattr(app_module, 'predict', lambda model, data, image_type, classes, preprocess=None, use_cache=True: ('normal', 0.9, 'No Disease Detected', None, None))
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('camp/oct/scan1.png', b'oct-bytes'); zf.writestr('camp/eye2.jpg', b'fundus-bytes'); zf.writestr('notes.txt', b'skip')
+    archive.seek(0)
+    response = client.post('/api/analyze/batch', data={'fundusImages': [(io.BytesIO(b'img'), 'eye1.jpg')], 'archive': (archive, 'camp.zip')}, content_type='multipart/form-data')
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert sorted((r['filename'], r['image_type']) for r in lines[:-1] if 'error' not in r) == [('camp/eye2.jpg', 'fundus'), ('camp/oct/scan1.png', 'oct'), ('eye1.jpg', 'fundus')]
+    assert [r['filename'] for r in lines[:-1] if 'error' in r] == ['notes.txt']
+    assert lines[-1] == {'summary': {'total': 4, 'errors': 1}}
+
+def test_liveness_and_readiness(client):
+    """Liveness never depends on the models; readiness is 503 until they are loaded and warmed up."""
+    assert client.get('/api/health/live').status_code == 200
+    response = client.get('/api/health/ready')
+    assert response.status_code == 503 and response.get_json()['ready'] is False
+
+def test_admin_reload_requires_token(client, monkeypatch):
+    """The reload endpoint is off without ADMIN_TOKEN and rejects a wrong token; a valid call queues the reload."""
+    assert client.post('/api/admin/reload').status_code == 404
+    monkeypatch.setitem(app_module.app.config, 'ADMIN_TOKEN', 'secret'); queued = []
+    monkeypatch.setattr(app_module.model_manager, 'reload', lambda names, force=False: queued.append((names, force)))
+    assert client.post('/api/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.post('/api/admin/reload', headers={'X-Admin-Token': 'sécret'.encode().decode('latin-1')}).status_code == 403
+    response = client.post('/api/admin/reload', json={'models': ['oct'], 'force': True}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 202 and queued == [(['oct'], True)]
+
+def test_metrics_endpoint_exposes_request_histograms(client):
+    """/metrics serves Prometheus text including the latency histogram of earlier requests."""
+    client.get('/api/health/live')
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert 'http_request_duration_seconds_count{endpoint="/api/health/live",method="GET"}' in response.data.decode()
@@ -0,0 +1,29 @@
+import pytest, sys, os, threading, numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.batcher import MicroBatcher
+
+def test_concurrent_requests_share_a_batch():
+    """Requests submitted together are run as one batch and each caller gets its own row."""
+    release, seen = threading.Event(), []
+    def predict_fn(batch):
+        release.wait(); seen.append(len(batch)); return batch.reshape(len(batch), -1).sum(axis=1)
+    batcher = MicroBatcher('test', predict_fn, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(np.full((2, 2), i, dtype=np.float32)) for i in range(4)]
+    release.set()
+    assert [f.result(5) for f in futures] == [0.0, 4.0, 8.0, 12.0]
+    assert seen == [4] and batcher.stats()['requests'] == 4
+    batcher.close()
+
+def test_batch_errors_reach_every_caller():
+    """An exception in the forward pass is raised for each request in the batch."""
+    def predict_fn(batch): raise ValueError("boom")
+    batcher = MicroBatcher('test', predict_fn, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(ValueError): batcher.predict(np.zeros((2, 2)), timeout=5)
+    assert batcher.stats()['errors'] == 1
+    batcher.close()
+
+def test_submit_after_close_is_rejected():
+    """A closed batcher refuses new work instead of returning a Future that never resolves."""
+    batcher = MicroBatcher('test', lambda batch: batch, max_batch_size=4, max_wait_ms=1)
+    batcher.close(); batcher.close()
+    with pytest.raises(RuntimeError): batcher.submit(np.zeros((2, 2)))
@@ -0,0 +1,37 @@
+import pytest, sys, os, cv2, numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from bulk_score import read_results, score_dataset
+
+class FakeEngine:
+    """Predicts glaucoma for every image and counts the images it sees."""
+    def __init__(self): self.predicted, self.explained = 0, 0
+    def predict(self, batch):
+        self.predicted += len(batch); return np.tile([0.1, 0.1, 0.1, 0.7], (len(batch), 1))
+    def explain(self, batch):
+        self.explained += len(batch); return self.predict(batch), np.ones((len(batch), 7, 7), dtype=np.float32)
+
+def make_dataset(root):
+    for i, (split, class_name) in enumerate([('train', 'normal'), ('train', 'glaucoma'), ('validation', 'glaucoma')]):
+        os.makedirs(root / split / class_name, exist_ok=True)
+        cv2.imwrite(str(root / split / class_name / f"{i}.jpg"), np.full((64, 64, 3), 40 * i, dtype=np.uint8))
+    (root / 'validation' / 'glaucoma' / 'broken.png').write_bytes(b'not an image')
+
+def test_scores_incrementally_and_resumes(tmp_path):
+    """Results are written part by part with severities and a bad file's error; a rerun only scores what is missing."""
+    make_dataset(tmp_path / 'data'); output = tmp_path / 'scores'; engine = FakeEngine()
+    assert score_dataset(engine, '7', str(tmp_path / 'data'), 'fundus', str(output), workers=1, batch_size=2, chunk_size=2, gradcam='disease', gradcam_limit=1) == 4
+    results = read_results(output).sort_values('path')
+    assert len(results) == 4 and results['error'].notna().sum() == 1 and engine.explained == 1
+    assert set(results.dropna(subset=['predicted_class'])['severity']) == {'Moderate'} and results['gradcam_path'].notna().sum() == 1
+    os.remove(output / 'part-00001.parquet')
+    engine = FakeEngine()
+    assert score_dataset(engine, '7', str(tmp_path / 'data'), 'fundus', str(output), workers=1, batch_size=2, chunk_size=2) == 2
+    assert engine.predicted == 1 and len(read_results(output)) == 4
+
+def test_resume_refuses_results_of_another_model_version(tmp_path):
+    """Rescoring into an output written by another version fails instead of mixing models; --restart starts over."""
+    make_dataset(tmp_path / 'data'); output = tmp_path / 'scores'
+    score_dataset(FakeEngine(), '7', str(tmp_path / 'data'), 'fundus', str(output), workers=1, batch_size=2, chunk_size=2, fmt='csv')
+    with pytest.raises(ValueError): score_dataset(FakeEngine(), '8', str(tmp_path / 'data'), 'fundus', str(output), workers=1, fmt='csv')
+    assert score_dataset(FakeEngine(), '8', str(tmp_path / 'data'), 'fundus', str(output), workers=1, fmt='csv', restart=True) == 4
+    assert set(read_results(output)['model_version'].astype(str)) == {'8'}
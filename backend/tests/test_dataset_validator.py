@@ -0,0 +1,40 @@
+import sys, os, cv2, numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import dataset_validator
+from dataset_validator import validate_dataset, check_leakage, scan_dataset, PerceptualIndex
+
+def write_image(path, seed, brightness=0):
+    rng = np.random.default_rng(seed); img = cv2.resize(rng.integers(0, 255, (8, 8, 3), dtype=np.uint8), (128, 128), interpolation=cv2.INTER_CUBIC)
+    os.makedirs(os.path.dirname(path), exist_ok=True); cv2.imwrite(str(path), cv2.add(img, np.full_like(img, brightness)))
+
+def test_validation_flags_corrupt_duplicate_and_near_duplicate_files(tmp_path, capsys):
+    """Corrupt and byte-identical files fail validation; a re-encoded brighter copy is reported as a near duplicate."""
+    root = tmp_path / 'train'
+    write_image(root / 'normal' / 'a.png', 1); write_image(root / 'normal' / 'b.png', 2); write_image(root / 'glaucoma' / 'c.png', 3)
+    write_image(root / 'glaucoma' / 'a_bright.jpg', 1, brightness=6)
+    (root / 'glaucoma' / 'a_copy.png').write_bytes((root / 'normal' / 'a.png').read_bytes()); (root / 'normal' / 'broken.jpg').write_bytes(b'not an image')
+    assert not validate_dataset(str(root), workers=2, cache_path=str(tmp_path / 'cache.json'))
+    out = capsys.readouterr().out
+    assert '[CORRUPTED] broken.jpg' in out and '[DUPLICATE] a.png is a duplicate of a_copy.png' in out
+    assert '[NEAR-DUPLICATE] glaucoma/a_copy.png resembles glaucoma/a_bright.jpg' in out
+
+def test_rescan_only_reads_changed_files(tmp_path, capsys):
+    """Unchanged files come from the (path, size, mtime) cache; only modified ones are scanned again."""
+    root = tmp_path / 'train'; cache_path = str(tmp_path / 'cache.json')
+    write_image(root / 'normal' / 'a.png', 1); write_image(root / 'normal' / 'b.png', 2)
+    scan_dataset(str(root), workers=1, cache_path=cache_path)
+    write_image(root / 'normal' / 'b.png', 5); os.utime(root / 'normal' / 'b.png', ns=(1, 1)); capsys.readouterr()
+    records = scan_dataset(str(root), workers=1, cache_path=cache_path)
+    assert 'Scanning 1 new or changed files (1 cached)' in capsys.readouterr().out and all(r['md5'] for r in records)
+
+def test_leakage_between_train_and_validation(tmp_path, monkeypatch):
+    """Identical copies fail the check; near copies are warnings unless near-duplicate leakage is made fatal."""
+    write_image(tmp_path / 'train' / 'normal' / 'a.png', 1); write_image(tmp_path / 'validation' / 'normal' / 'a.jpg', 1, brightness=4)
+    write_image(tmp_path / 'validation' / 'normal' / 'z.png', 9)
+    monkeypatch.setattr(dataset_validator, 'CACHE_DIR', str(tmp_path / 'cache'))
+    assert check_leakage(str(tmp_path / 'train'), str(tmp_path / 'validation'), workers=1)
+    assert not check_leakage(str(tmp_path / 'train'), str(tmp_path / 'validation'), workers=1, fail_on_near_duplicates=True)
+    (tmp_path / 'validation' / 'normal' / 'copy.png').write_bytes((tmp_path / 'train' / 'normal' / 'a.png').read_bytes())
+    assert not check_leakage(str(tmp_path / 'train'), str(tmp_path / 'validation'), workers=1)
+    index = PerceptualIndex(max_distance=2); index.add(0b1011, 0, 'x')
+    assert index.query(0b1000, 0) == [('x', 2)] and index.query(0b0100, 0) == []
@@ -0,0 +1,43 @@
+import sys, os, time, threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.gemini_api import GeminiAPI
+
+class FakeGemini:
+    """Local stand-in for genai.GenerativeModel that counts calls and can be slowed down."""
+    def __init__(self, delay=0.0, text="**What is it?** A test condition."):
+        self.delay, self.text, self.calls = delay, text, 0; self._lock = threading.Lock()
+    def generate_content(self, prompt, request_options=None):
+        with self._lock: self.calls += 1
+        time.sleep(self.delay)
+        return type('Response', (), {'text': self.text})()
+
+def test_explanations_are_deduplicated_and_persisted(tmp_path):
+    """Concurrent identical requests share one call, and the result survives a restart through the cache file."""
+    cache_path = str(tmp_path / 'explanations.json'); fake = FakeGemini(delay=0.2)
+    api = GeminiAPI(None, model=fake, cache_path=cache_path, cacheable_diseases={'glaucoma'})
+    futures = [api.get_disease_explanation_async('glaucoma') for _ in range(5)]
+    assert {f.result(5) for f in futures} == {fake.text} and fake.calls == 1
+    restarted_fake = FakeGemini(); restarted = GeminiAPI(None, model=restarted_fake, cache_path=cache_path, cacheable_diseases={'glaucoma'})
+    assert restarted.get_disease_explanation('Glaucoma') == fake.text and restarted_fake.calls == 0
+
+def test_only_known_diseases_are_cached(tmp_path):
+    """Free-text disease names are answered but never cached or written to disk."""
+    fake = FakeGemini(); api = GeminiAPI(None, model=fake, cache_path=str(tmp_path / 'explanations.json'), cacheable_diseases={'glaucoma'})
+    api.get_disease_explanation('made up condition'); api.get_disease_explanation('made up condition')
+    assert fake.calls == 2 and not (tmp_path / 'explanations.json').exists()
+
+def test_slow_recommendations_fall_back_to_defaults():
+    """A response slower than the timeout yields the default recommendations."""
+    api = GeminiAPI(None, model=FakeGemini(delay=1.0), timeout=0.1)
+    assert api.get_recommendations({'name': 'Test'}, {}) == api._get_default_recommendations()
+
+def test_prewarm_runs_in_one_process_and_others_read_the_file(tmp_path):
+    """Only the holder of the prewarm lock calls the model; another instance skips prewarming and reads its results from disk."""
+    cache_path = str(tmp_path / 'explanations.json'); first_fake, second_fake = FakeGemini(), FakeGemini()
+    first = GeminiAPI(None, model=first_fake, cache_path=cache_path, cacheable_diseases={'glaucoma', 'cataracts'})
+    second = GeminiAPI(None, model=second_fake, cache_path=cache_path, cacheable_diseases={'glaucoma', 'cataracts'})
+    for future in first.prewarm_explanations(): future.result(5)
+    assert second.prewarm_explanations() == [] and first_fake.calls == 2
+    assert second.get_disease_explanation('glaucoma') == first_fake.text and second_fake.calls == 0
+    assert sorted(os.listdir(tmp_path)) == ['explanations.json', 'explanations.json.lock']
+    first.close(); second.close()
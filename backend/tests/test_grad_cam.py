@@ -0,0 +1,28 @@
+import sys, os, numpy as np, tensorflow as tf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.grad_cam import GradCamEngine
+
+def build_model(num_classes, nested=False):
+    inputs = tf.keras.Input(shape=(32, 32, 3)); x = tf.keras.layers.Rescaling(1 / 255.0)(inputs)
+    conv = tf.keras.layers.Conv2D(8, 3, activation='relu')
+    if nested:
+        backbone_inputs = tf.keras.Input(shape=(32, 32, 3)); backbone = tf.keras.Model(backbone_inputs, conv(backbone_inputs), name='backbone'); x = backbone(x)
+    else: x = conv(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(inputs, tf.keras.layers.Dense(num_classes, activation='softmax')(x))
+
+def test_explain_returns_probabilities_and_cams_for_a_batch():
+    """One call yields the model's probabilities and a normalized CAM per image."""
+    model = build_model(4); engine = GradCamEngine(model)
+    batch = np.random.randint(0, 256, (3, 32, 32, 3), dtype=np.uint8)
+    probs, cams = engine.explain(batch)
+    assert probs.shape == (3, 4) and cams.shape == (3, 30, 30)
+    np.testing.assert_allclose(probs, model.predict_on_batch(batch.astype(np.float32)), rtol=1e-5, atol=1e-6)
+    assert cams.min() >= 0.0 and cams.max() <= 1.0 + 1e-6
+
+def test_feature_layer_found_inside_nested_backbone():
+    """Models that wrap their convolutions in a backbone sub-model still get a Grad-CAM layer."""
+    model = build_model(2, nested=True)
+    assert GradCamEngine.find_feature_layer(model) == 'backbone'
+    _, cams = GradCamEngine(model).explain(np.zeros((1, 32, 32, 3), dtype=np.uint8))
+    assert cams.shape == (1, 30, 30)
@@ -0,0 +1,49 @@
+import pytest, sys, os, cv2, numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.image_processor import ImageProcessor, OCT_ENHANCE_MODES
+
+def synthetic_jpeg(size):
+    img = np.zeros((size, size, 3), dtype=np.uint8); cv2.circle(img, (size // 2, size // 2), size // 3, (40, 90, 200), -1)
+    return cv2.imencode('.jpg', img)[1].tobytes()
+
+def test_preprocessors_accept_bytes_and_paths(tmp_path):
+    """In-memory uploads and files on disk go through the same decode and give identical tensors."""
+    data = synthetic_jpeg(300); path = tmp_path / 'eye.jpg'; path.write_bytes(data)
+    processor = ImageProcessor()
+    np.testing.assert_array_equal(processor.preprocess_fundus(data), processor.preprocess_fundus(str(path)))
+    np.testing.assert_array_equal(processor.enhance_oct(memoryview(data)), processor.enhance_oct(np.frombuffer(data, np.uint8)))
+    assert processor.preprocess_fundus(data).shape == (224, 224, 3)
+
+def test_large_jpeg_uses_reduced_decode():
+    """Large JPEGs are decoded at a reduced scale that still stays above the configured minimum side."""
+    data = synthetic_jpeg(2000)
+    assert ImageProcessor(reduced_decode_min_side=448).decode_image(data).shape == (500, 500, 3)
+    assert ImageProcessor(reduced_decode_min_side=0).decode_image(data).shape == (2000, 2000, 3)
+
+def test_oct_enhance_modes_share_output_shape():
+    """Every OCT enhancement mode yields a 224x224 RGB tensor; unknown modes are rejected."""
+    scan = cv2.imencode('.png', np.random.randint(0, 255, (496, 768), dtype=np.uint8))[1].tobytes()
+    processor = ImageProcessor()
+    for mode in OCT_ENHANCE_MODES: assert processor.enhance_oct(scan, mode).shape == (224, 224, 3)
+    with pytest.raises(ValueError): ImageProcessor(oct_enhance_mode='gaussian')
+
+def test_oct_downscale_keeps_aspect_ratio():
+    """Wide B-scans are shrunk by one factor to fit twice the target size; smaller scans are never upscaled."""
+    processor = ImageProcessor()
+    assert processor.denoise_oct(np.zeros((496, 768), dtype=np.uint8), 'median').shape == (289, 448)
+    assert processor.denoise_oct(np.zeros((300, 400), dtype=np.uint8), 'median').shape == (300, 400)
+
+def test_batch_apis_match_per_image_methods():
+    """Batch variants return one contiguous uint8 NHWC array identical to stacking the per-image results."""
+    fundus = [synthetic_jpeg(size) for size in (300, 400, 500)]
+    scans = [cv2.imencode('.png', np.random.randint(0, 255, (200, 300), dtype=np.uint8))[1].tobytes() for _ in range(3)]
+    processor = ImageProcessor(batch_workers=2)
+    batch = processor.preprocess_fundus_batch(fundus)
+    assert batch.dtype == np.uint8 and batch.shape == (3, 224, 224, 3) and batch.flags.c_contiguous
+    np.testing.assert_array_equal(batch, np.stack([processor.preprocess_fundus(f) for f in fundus]))
+    out = np.empty((3, 224, 224, 3), dtype=np.uint8)
+    assert processor.enhance_oct_batch(scans, 'median', out=out) is out
+    np.testing.assert_array_equal(out, np.stack([processor.enhance_oct(s, 'median') for s in scans]))
+    cams = np.random.rand(3, 7, 7).astype(np.float32)
+    assert processor.overlay_heatmap_batch(batch, cams) == [processor.overlay_heatmap(img, cam) for img, cam in zip(batch, cams)]
+    processor.close()
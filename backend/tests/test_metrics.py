@@ -0,0 +1,30 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.metrics import Metrics
+from utils.profiling import make_profiler
+
+def test_histograms_render_cumulative_prometheus_buckets():
+    """Observations land in cumulative le buckets with _sum and _count; counters and gauges render with their labels."""
+    metrics = Metrics(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 2.0): metrics.observe('stage_duration_seconds', seconds, stage='preprocess')
+    metrics.inc('model_inferences_total', model='oct', version='3'); metrics.set('models_ready', 1)
+    text = metrics.render()
+    assert 'stage_duration_seconds_bucket{stage="preprocess",le="0.1"} 1' in text and 'stage_duration_seconds_bucket{stage="preprocess",le="1.0"} 2' in text
+    assert 'stage_duration_seconds_bucket{stage="preprocess",le="+Inf"} 3' in text and 'stage_duration_seconds_count{stage="preprocess"} 3' in text
+    assert 'model_inferences_total{model="oct",version="3"} 1' in text and 'models_ready 1' in text
+
+def test_breakdown_collects_timed_stages_of_the_current_request():
+    """Stages timed inside breakdown() are summed per stage and label; outside it only the histograms are updated."""
+    metrics = Metrics()
+    with metrics.breakdown() as timings:
+        with metrics.time('preprocess', image_type='fundus'): pass
+        with metrics.time('preprocess', image_type='fundus'): pass
+    with metrics.time('upload'): pass
+    assert list(timings) == ['preprocess.fundus'] and 'stage_duration_seconds_count{stage="upload"} 1' in metrics.render()
+
+def test_profiler_samples_one_in_n_requests(tmp_path):
+    """With sample_every=2 only every second request is profiled and written out."""
+    profiler = make_profiler('cprofile', 2, str(tmp_path))
+    for _ in range(4): profiler.stop(profiler.start(), '/api/analyze')
+    assert len([f for f in os.listdir(tmp_path) if f.endswith('.prof')]) == 2
+    assert make_profiler(None, 10, str(tmp_path)) is None
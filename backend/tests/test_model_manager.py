@@ -0,0 +1,64 @@
+import sys, os, numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.model_manager import ModelManager
+
+class FakeEngine:
+    def __init__(self): self.calls = []
+    def explain(self, batch): self.calls.append(batch.shape); return np.ones((len(batch), 2)), None
+
+def make_manager(fetch, names=('fundus', 'oct')):
+    engines = {}
+    def build(name, source):
+        engines[name] = FakeEngine(); return source['version'], engines[name]
+    manager = ModelManager(names, fetch, build, lambda name, engine: None, lambda name: np.zeros((1, 4, 4, 3), dtype=np.uint8))
+    return manager, engines
+
+def test_models_load_in_background_and_are_warmed_up():
+    """start() returns immediately; both models are built, warmed up with a dummy batch and the manager becomes ready."""
+    manager, engines = make_manager(lambda name: {'version': '3'})
+    assert not manager.is_ready() and manager.get('fundus') is None
+    manager.start(); assert manager.wait_ready(10)
+    assert manager.get('oct').version == '3' and engines['fundus'].calls == [(1, 4, 4, 3)]
+    assert manager.status()['time_to_ready_s'] is not None
+
+def test_failed_model_keeps_manager_unready():
+    """A model that cannot be fetched is reported with its error and readiness stays false."""
+    def fetch(name):
+        if name == 'oct': raise LookupError('no production version')
+        return {'version': '1'}
+    manager, _ = make_manager(fetch); manager.start(); manager._thread.join(10)
+    status = manager.status()
+    assert not status['ready'] and status['models']['fundus']['loaded'] and status['models']['oct']['error'] == 'no production version'
+
+def test_prefetched_sources_are_not_fetched_again():
+    """Sources fetched before fork are consumed by the background build instead of being fetched again."""
+    fetched = []
+    manager, _ = make_manager(lambda name: fetched.append(name) or {'version': '2'}); manager.prefetch()
+    manager.start(); assert manager.wait_ready(10)
+    assert sorted(fetched) == ['fundus', 'oct']
+
+def test_stale_prefetched_source_is_fetched_again():
+    """A worker started after a promotion ignores the version prefetched at boot and loads the registry's current one."""
+    registry, fetched = {'fundus': '1'}, []
+    manager = ModelManager(['fundus'], lambda name: fetched.append(registry[name]) or {'version': registry[name]}, lambda name, source: (source['version'], FakeEngine()),
+                           lambda name, engine: None, lambda name: np.zeros((1, 4, 4, 3), dtype=np.uint8), resolve=lambda name: registry[name])
+    manager.prefetch(); registry['fundus'] = '2'
+    manager.start(); assert manager.wait_ready(10)
+    assert manager.get('fundus').version == '2' and fetched == ['1', '2']
+
+class FakeBatcher:
+    def __init__(self): self.closed = False
+    def close(self): self.closed = True
+
+def test_reload_swaps_new_version_after_in_flight_requests_finish():
+    """A promoted version is loaded and swapped in; the old one keeps serving its in-flight request, then closes."""
+    registry, swaps = {'fundus': '1'}, []
+    manager = ModelManager(['fundus'], lambda name: {'version': registry[name]}, lambda name, source: (source['version'], FakeEngine()),
+                           lambda name, engine: FakeBatcher(), lambda name: np.zeros((1, 4, 4, 3), dtype=np.uint8),
+                           resolve=lambda name: registry[name], on_swap=lambda name, old, new: swaps.append((old and old.version, new.version)))
+    manager.start(); assert manager.wait_ready(10)
+    assert manager.reload().result(10) == []
+    with manager.use('fundus') as old:
+        registry['fundus'] = '2'; assert manager.reload().result(10) == ['fundus']
+        assert manager.get('fundus').version == '2' and not old.batcher.closed
+    assert old.batcher.closed and swaps == [(None, '1'), ('1', '2')]
@@ -0,0 +1,46 @@
+import pytest, sys, os, threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from concurrent.futures import Future
+from utils.report_queue import ReportQueue, ReportQueueFull
+
+class FakeGenerator:
+    def __init__(self): self.release = threading.Event()
+    def layout_report(self, patient_data, analysis_results, report_id=None): return report_id
+    def finalize_report(self, draft, recommendations):
+        self.release.wait(5); return f"{draft}-{recommendations}.pdf"
+
+def test_jobs_wait_for_recommendations_and_report_status():
+    """A job stays pending until its recommendations resolve, then reports the built file."""
+    generator = FakeGenerator(); generator.release.set(); queue = ReportQueue(generator, max_workers=1)
+    recommendations = Future(); job_id = queue.submit({}, {}, recommendations)
+    assert queue.status(job_id)['status'] in ('queued', 'running')
+    recommendations.set_result('recs')
+    status = queue.wait(job_id, 5)
+    assert status['status'] == 'ready' and status['filename'] == f'{job_id}-recs.pdf' and status['finished_at'] >= status['submitted_at']
+    assert queue.status('missing') is None
+    queue.close()
+
+def test_queue_rejects_work_beyond_max_pending():
+    """Submissions beyond the pending bound raise instead of queueing without limit."""
+    generator = FakeGenerator(); queue = ReportQueue(generator, max_workers=1, max_pending=2)
+    queue.submit({}, {}, 'a'); queue.submit({}, {}, 'b')
+    with pytest.raises(ReportQueueFull): queue.submit({}, {}, 'c')
+    generator.release.set(); queue.close()
+
+def test_pending_recommendations_do_not_hold_a_worker():
+    """A job waiting on its recommendations leaves the pool free for the jobs queued behind it."""
+    generator = FakeGenerator(); generator.release.set(); queue = ReportQueue(generator, max_workers=1)
+    slow = Future(); slow_id = queue.submit({}, {}, slow); fast_id = queue.submit({}, {}, 'now')
+    assert queue.wait(fast_id, 5)['status'] == 'ready' and queue.status(slow_id)['status'] == 'running'
+    slow.set_result('later')
+    assert queue.wait(slow_id, 5)['filename'] == f'{slow_id}-later.pdf'
+    queue.close()
+
+def test_status_is_readable_from_another_process(tmp_path):
+    """Status files next to the reports let a queue that never saw the job answer for it."""
+    generator = FakeGenerator(); generator.release.set(); generator.reports_dir = str(tmp_path)
+    queue, other_worker = ReportQueue(generator, max_workers=1), ReportQueue(generator, max_workers=1)
+    job_id = queue.submit({}, {}, 'recs'); queue.wait(job_id, 5)
+    assert other_worker.status(job_id) == queue.status(job_id) and other_worker.wait(job_id, 5)['status'] == 'ready'
+    assert other_worker.status('../etc/passwd') is None
+    queue.close(); other_worker.close()
@@ -0,0 +1,25 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.result_cache import ResultCache
+
+def test_lru_eviction_and_ttl_expiry():
+    """Entries are evicted least-recently-used first once the byte budget is hit, and expire after the TTL."""
+    now = [0.0]; cache = ResultCache(max_bytes=700, ttl_seconds=10, clock=lambda: now[0])
+    keys = [ResultCache.make_key(bytes([i]), 'fundus-model', '1', 'fundus') for i in range(3)]
+    cache.put(keys[0], ('normal', 0.9, 'x' * 50)); cache.put(keys[1], ('normal', 0.8, 'x' * 50))
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], ('glaucoma', 0.7, 'x' * 50))
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) is not None and cache.stats()['evictions'] == 1
+    now[0] = 11.0
+    assert cache.get(keys[2]) is None
+
+def test_key_includes_model_version_and_invalidation():
+    """A new model version never sees old results, and invalidate() drops one model's entries."""
+    cache = ResultCache()
+    old, new = ResultCache.make_key(b'img', 'oct-model', '1', 'oct'), ResultCache.make_key(b'img', 'oct-model', '2', 'oct')
+    other = ResultCache.make_key(b'img', 'fundus-model', '1', 'fundus')
+    cache.put(old, ('normal', 0.9)); cache.put(other, ('normal', 0.9))
+    assert old != new and cache.get(new) is None
+    cache.invalidate('oct-model')
+    assert cache.get(old) is None and cache.get(other) is not None
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,26 @@
+import sys, os, numpy as np, pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.grad_cam import GradCamEngine
+from utils.tflite_engine import TFLiteEngine, convert_to_tflite
+from test_grad_cam import build_model
+
+def write_artifact(tmp_path, model, quantization, representative_images=None):
+    path = tmp_path / f"model_{quantization}.tflite"; path.write_bytes(convert_to_tflite(model, quantization, representative_images))
+    return str(path)
+
+def test_float_artifact_matches_keras_engine(tmp_path):
+    """The unquantized artifact returns the same probabilities and CAMs as the Keras Grad-CAM engine, for any batch size."""
+    model = build_model(4); engine = TFLiteEngine(write_artifact(tmp_path, model, 'float32'))
+    for size in (3, 1):
+        batch = np.random.randint(0, 256, (size, 32, 32, 3), dtype=np.uint8)
+        probs, cams = engine.explain(batch); expected_probs, expected_cams = GradCamEngine(model).explain(batch)
+        np.testing.assert_allclose(probs, expected_probs, atol=1e-5); np.testing.assert_allclose(cams, expected_cams, atol=1e-4)
+
+def test_int8_artifact_needs_calibration_images(tmp_path):
+    """int8 conversion calibrates on representative images and still serves probability rows and CAMs."""
+    model = build_model(2, nested=True)
+    with pytest.raises(ValueError): convert_to_tflite(model, 'int8')
+    images = np.random.randint(0, 256, (8, 32, 32, 3)).astype(np.float32)
+    probs, cams = TFLiteEngine(write_artifact(tmp_path, model, 'int8', images)).explain(images[:2].astype(np.uint8))
+    assert probs.shape == (2, 2) and cams.shape == (2, 30, 30)
+    np.testing.assert_allclose(probs.sum(axis=1), 1.0, atol=0.05)
@@ -0,0 +1,79 @@
+import io, zipfile, tarfile, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.image_processor import ImageProcessor
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+UNSUPPORTED_IMAGE = 'Not a supported image type (.png, .jpg, .jpeg).'
+IMAGE_TOO_LARGE = 'Image exceeds the per-image size limit.'
+_worker_processor = None
+
+def _init_worker(decode_min_side, oct_enhance_mode):
+    global _worker_processor
+    _worker_processor = ImageProcessor(decode_min_side, oct_enhance_mode)
+
+def preprocess_image(data, image_type):
+    """Runs in a pool process: decodes and preprocesses one image with the serving ImageProcessor."""
+    return _worker_processor.preprocess_fundus(data) if image_type == 'fundus' else _worker_processor.enhance_oct(data)
+
+def try_preprocess_image(data, image_type):
+    """preprocess_image for bulk jobs that must not stop on one bad file: returns (array, None) or (None, error)."""
+    try: return preprocess_image(data, image_type), None
+    except Exception as e: return None, str(e) or type(e).__name__
+
+def make_preprocess_pool(workers, decode_min_side, oct_enhance_mode):
+    # 'spawn' keeps TensorFlow's threads out of the children; they only need OpenCV.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker, initargs=(decode_min_side, oct_enhance_mode))
+
+def _archive_image_type(member_name, default_type):
+    parts = [p.lower() for p in member_name.replace('\\', '/').split('/')[:-1]]
+    return 'oct' if 'oct' in parts else 'fundus' if 'fundus' in parts else default_type
+
+def detach_uploads(files, fields=('fundusImages', 'octImages', 'archive')):
+    """Takes the upload streams away from the request so a streamed response can still read them after the view
+    returns (Flask closes request files when the view's context is popped). The caller closes them."""
+    uploads = []
+    for field in fields:
+        for file in files.getlist(field):
+            if file and file.filename: uploads.append((field, file.filename, file.stream)); file.stream = io.BytesIO()
+    return uploads
+
+def iter_batch_uploads(uploads, default_type, max_image_bytes):
+    """Yields (filename, image_type, bytes) lazily from detached `fundusImages`, `octImages` and `archive` (zip/tar) uploads.
+    Entries that are not analyzed are yielded as (filename, None, reason), so every file the client sent gets a result line."""
+    try:
+        for field, filename, stream in uploads:
+            name = filename.lower()
+            if field != 'archive':
+                if name.endswith(IMAGE_EXTENSIONS): yield filename, 'oct' if field == 'octImages' else 'fundus', stream.read()
+                else: yield filename, None, UNSUPPORTED_IMAGE
+            elif name.endswith('.zip'):
+                with zipfile.ZipFile(stream) as zf:
+                    for info in zf.infolist():
+                        if info.is_dir(): continue
+                        if not info.filename.lower().endswith(IMAGE_EXTENSIONS): yield info.filename, None, UNSUPPORTED_IMAGE; continue
+                        if info.file_size > max_image_bytes: yield info.filename, None, IMAGE_TOO_LARGE; continue
+                        yield info.filename, _archive_image_type(info.filename, default_type), zf.read(info)
+            elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+                with tarfile.open(fileobj=stream, mode='r:*') as tar:
+                    for member in tar:
+                        if not member.isfile(): continue
+                        if not member.name.lower().endswith(IMAGE_EXTENSIONS): yield member.name, None, UNSUPPORTED_IMAGE; continue
+                        if member.size > max_image_bytes: yield member.name, None, IMAGE_TOO_LARGE; continue
+                        yield member.name, _archive_image_type(member.name, default_type), tar.extractfile(member).read()
+            else: yield filename, None, 'Unsupported archive format; expected .zip, .tar, .tar.gz or .tgz.'
+    finally:
+        for _, _, stream in uploads: stream.close()
+
+def stream_results(items, analyze, max_inflight):
+    """Runs `analyze(index, filename, image_type, data)` over `items` with at most `max_inflight` images held at once,
+    yielding results as they complete. Items are only pulled from the iterator when a slot frees up."""
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix='batch-analyze') as executor:
+        pending = set()
+        for index, (filename, image_type, data) in enumerate(items):
+            if len(pending) >= max_inflight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done: yield future.result()
+            pending.add(executor.submit(analyze, index, filename, image_type, data))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done: yield future.result()
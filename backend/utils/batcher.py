@@ -0,0 +1,67 @@
+import threading, queue, time, numpy as np
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """Groups concurrent single-image requests for one model into a single forward pass."""
+    def __init__(self, name, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.name = name; self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size)); self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue(); self._lock = threading.Lock(); self._closed = False
+        self._requests, self._batches, self._errors, self._max_depth = 0, 0, 0, 0
+        self._batch_sizes = {}
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True); self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        with self._lock:  # checked and enqueued together, so nothing lands behind close()'s sentinel
+            if self._closed: raise RuntimeError(f"Batcher '{self.name}' is closed.")
+            self._queue.put((item, future)); self._requests += 1; self._max_depth = max(self._max_depth, self._queue.qsize())
+        return future
+
+    def predict(self, item, timeout=None): return self.submit(item).result(timeout)
+
+    def close(self):
+        with self._lock:
+            if self._closed: return
+            self._closed = True; self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            sizes = dict(sorted(self._batch_sizes.items())); total = sum(k * v for k, v in sizes.items())
+            return {'queue_depth': self._queue.qsize(), 'max_queue_depth': self._max_depth, 'requests': self._requests, 'batches': self._batches,
+                    'errors': self._errors, 'avg_batch_size': round(total / self._batches, 2) if self._batches else 0.0, 'batch_size_histogram': sizes}
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None: return None
+        batch, deadline = [first], time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try: entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty: break
+            if entry is None: self._queue.put(None); break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None: return self._fail_pending()
+            items, futures = zip(*batch)
+            with self._lock:
+                self._batches += 1; self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            try:
+                outputs = self.predict_fn(np.stack(items))
+                for i, future in enumerate(futures):
+                    future.set_result(tuple(o[i] if o is not None else None for o in outputs) if isinstance(outputs, tuple) else outputs[i])
+            except Exception as e:
+                with self._lock: self._errors += 1
+                for future in futures:
+                    if not future.done(): future.set_exception(e)
+
+    def _fail_pending(self):
+        while True:
+            try: entry = self._queue.get_nowait()
+            except queue.Empty: return
+            if entry is not None and not entry[1].done(): entry[1].set_exception(RuntimeError(f"Batcher '{self.name}' is closed."))
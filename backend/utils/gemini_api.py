@@ -1,7 +1,16 @@
-import google.generativeai as genai
+import os, json, tempfile, threading, google.generativeai as genai
+from concurrent.futures import Future, ThreadPoolExecutor
+try: import fcntl
+except ImportError: fcntl = None  # no cross-process prewarm lock off POSIX; every process prewarms
 
 class GeminiAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, model=None, timeout=20.0, max_workers=4, cache_path=None, cacheable_diseases=()):
+        self.timeout = timeout; self.cache_path = cache_path; self.cacheable_diseases = {d.lower() for d in cacheable_diseases}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gemini')
+        self._lock = threading.Lock(); self._file_lock = threading.Lock(); self._inflight = {}; self._prewarm_lock = None
+        self._cache_mtime = None; self._explanations = self._load_explanations()
+        if model is not None:
+            self.model = model; return
         if not api_key:
             print("Warning: Gemini API key not provided. Using default recommendations.")
             self.model = None
@@ -13,7 +22,11 @@ class GeminiAPI:
             print(f"Error configuring Gemini API: {e}"); self.model = None
     
     def get_recommendations(self, patient_data, analysis_results):
-        if not self.model: return self._get_default_recommendations()
+        return self.get_recommendations_async(patient_data, analysis_results).result()
+
+    def get_recommendations_async(self, patient_data, analysis_results):
+        """Returns a Future with the recommendations text; it falls back to the defaults on error or after `timeout` seconds."""
+        if not self.model: return self._resolved(self._get_default_recommendations())
         prompt = f"""
         As a medical AI assistant, provide detailed recommendations for a patient with the following information.
         Format the response clearly for a medical report.
@@ -43,25 +56,123 @@ class GeminiAPI:
         4. PREVENTIVE MEASURES: How to prevent progression.
         5. KEY WARNING SIGNS: Symptoms requiring immediate attention.
         """
-        try:
-            return self.model.generate_content(prompt).text
-        except Exception as e:
-            print(f"Error getting Gemini recommendations: {e}"); return self._get_default_recommendations()
-    
+        return self._with_fallback(self._generate(prompt), self._get_default_recommendations(), "recommendations")
+
     def get_disease_explanation(self, disease_name):
         """Generates a simple explanation of a disease for a patient."""
+        return self.get_disease_explanation_async(disease_name).result()
+
+    def get_disease_explanation_async(self, disease_name):
         if not self.model:
-            return "Detailed explanation is currently unavailable."
+            return self._resolved("Detailed explanation is currently unavailable.")
+        key = disease_name.strip().lower()
+        with self._lock: cached = self._explanations.get(key)
+        if cached is None and key in self.cacheable_diseases: cached = self._reload_explanation(key)
+        if cached is not None: return self._resolved(cached)
         prompt = f"""
         Explain the medical condition '{disease_name.replace('_', ' ')}' in simple, easy-to-understand terms for a patient.
         Structure the explanation with these sections: **What is it?**, **What causes it?**, and **Common Symptoms**.
         Keep the tone reassuring and informative. Do not provide medical advice.
         """
+        on_result = (lambda text: self._store_explanation(key, text)) if key in self.cacheable_diseases else None
+        return self._with_fallback(self._generate(prompt, on_result), "Could not generate an explanation at this time.", "disease explanation")
+
+    def prewarm_explanations(self):
+        """Starts generating the cacheable explanations that are not cached yet, without waiting for them. With a cache
+        file, only the process holding `<cache_path>.lock` prewarms (one gunicorn worker, not all of them); the others
+        read its results from the cache file on their first miss."""
+        if not self._acquire_prewarm_lock(): return []
+        return [self.get_disease_explanation_async(name) for name in sorted(self.cacheable_diseases)]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._prewarm_lock is not None: self._prewarm_lock.close(); self._prewarm_lock = None
+
+    def _acquire_prewarm_lock(self):
+        # Held for the life of the process, so a respawned worker takes over only after the holder exits.
+        if not self.cache_path or fcntl is None: return True
+        if self._prewarm_lock is not None: return True
         try:
-            return self.model.generate_content(prompt).text
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True); lock = open(f"{self.cache_path}.lock", 'a')
+        except OSError as e:
+            print(f"Error opening explanation prewarm lock: {e}"); return True
+        try: fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close(); return False
+        self._prewarm_lock = lock; return True
+
+    def _generate(self, prompt, on_result=None):
+        # Identical prompts already in flight share one upstream call; `on_result` runs inside that call,
+        # so its side effects are visible before the in-flight entry is dropped.
+        with self._lock:
+            future = self._inflight.get(prompt)
+            if future is not None: return future
+            future = self._inflight[prompt] = self._executor.submit(self._call_model, prompt, on_result)
+        future.add_done_callback(lambda f: self._forget(prompt))
+        return future
+
+    def _call_model(self, prompt, on_result):
+        text = self.model.generate_content(prompt, request_options={'timeout': self.timeout}).text
+        if on_result: on_result(text)
+        return text
+
+    def _forget(self, prompt):
+        with self._lock: self._inflight.pop(prompt, None)
+
+    def _with_fallback(self, future, fallback, label):
+        result, settled = Future(), threading.Lock()
+        def settle(value, error=None):
+            with settled:
+                if result.done(): return
+                if error: print(f"Error getting Gemini {label}: {error}")
+                result.set_result(value)
+        timer = threading.Timer(self.timeout, lambda: settle(fallback, f"timed out after {self.timeout}s")); timer.daemon = True; timer.start()
+        def on_done(f):
+            timer.cancel()
+            try: settle(f.result())
+            except Exception as e: settle(fallback, e)
+        future.add_done_callback(on_done)
+        return result
+
+    @staticmethod
+    def _resolved(value):
+        future = Future(); future.set_result(value); return future
+
+    def _load_explanations(self):
+        if not self.cache_path or not os.path.exists(self.cache_path): return {}
+        try:
+            mtime = os.stat(self.cache_path).st_mtime_ns
+            with open(self.cache_path, 'r', encoding='utf-8') as f: cached = json.load(f)
+            self._cache_mtime = mtime; return {k: v for k, v in cached.items() if k in self.cacheable_diseases}
         except Exception as e:
-            print(f"Error generating disease explanation: {e}")
-            return "Could not generate an explanation at this time."
+            print(f"Error reading explanation cache: {e}"); return {}
+
+    def _reload_explanation(self, key):
+        """Picks up explanations another process wrote to the cache file since it was last read."""
+        if not self.cache_path: return None
+        try: mtime = os.stat(self.cache_path).st_mtime_ns
+        except OSError: return None
+        if mtime == self._cache_mtime: return None
+        loaded = self._load_explanations()
+        with self._lock:
+            for k, v in loaded.items(): self._explanations.setdefault(k, v)
+            return self._explanations.get(key)
+
+    def _store_explanation(self, key, text):
+        with self._lock: self._explanations[key] = text; snapshot = dict(self._explanations)
+        if not self.cache_path: return
+        with self._file_lock:
+            tmp_path = None
+            try:
+                # A per-process temp file, so writers in other workers never interleave before the atomic replace.
+                directory = os.path.dirname(os.path.abspath(self.cache_path)); os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.explanations-', suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f: json.dump(snapshot, f, indent=2)
+                os.replace(tmp_path, self.cache_path); tmp_path = None
+            except Exception as e:
+                print(f"Error writing explanation cache: {e}")
+            finally:
+                if tmp_path is not None and os.path.exists(tmp_path): os.remove(tmp_path)
 
     def _get_default_recommendations(self):
         return """
@@ -0,0 +1,46 @@
+import numpy as np, tensorflow as tf
+
+class GradCamEngine:
+    """Grad-CAM for one loaded model. The gradient model is built and traced once; every call returns
+    the class probabilities and the CAMs of a whole batch from a single forward/backward pass."""
+    def __init__(self, model, last_conv_layer_name=None):
+        self.model = model; self.layer_name = last_conv_layer_name or self.find_feature_layer(model)
+        feature_layer = model.get_layer(self.layer_name)
+        self.grad_model = tf.keras.models.Model(model.inputs, [feature_layer.get_output_at(len(feature_layer.inbound_nodes) - 1), model.output])
+        spec = [tf.TensorSpec((None, *model.input_shape[1:]), tf.float32)]
+        self._predict = tf.function(self._predict_batch, input_signature=spec)
+        self._explain = tf.function(self._explain_batch, input_signature=spec)
+
+    @staticmethod
+    def find_feature_layer(model):
+        """Last Conv2D of the model, or the last layer with a spatial output when the convolutions sit inside a nested backbone."""
+        conv_layers = [layer.name for layer in model.layers if isinstance(layer, tf.keras.layers.Conv2D)]
+        if conv_layers: return conv_layers[-1]
+        spatial_layers = [layer.name for layer in model.layers if len(layer.output.shape) == 4]
+        if not spatial_layers: raise ValueError(f"Model '{model.name}' has no spatial layer to compute Grad-CAM from.")
+        return spatial_layers[-1]
+
+    def _prepare(self, batch):
+        return tf.keras.applications.efficientnet_v2.preprocess_input(np.asarray(batch, dtype=np.float32))
+
+    def _predict_batch(self, images): return self.model(images, training=False)
+
+    def _explain_batch(self, images):
+        with tf.GradientTape() as tape:
+            conv_output, preds = self.grad_model(images, training=False)
+            class_scores = tf.gather(preds, tf.argmax(preds, axis=1), batch_dims=1)
+        grads = tape.gradient(class_scores, conv_output)
+        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+        cams = tf.nn.relu(tf.einsum('nhwc,nc->nhw', conv_output, pooled_grads))
+        cams = cams / (tf.reduce_max(cams, axis=(1, 2), keepdims=True) + tf.keras.backend.epsilon())
+        return preds, cams
+
+    def explain_function(self):
+        """The traced probabilities + CAMs function, e.g. for conversion to a serving artifact."""
+        return self._explain.get_concrete_function()
+
+    def predict(self, batch): return self._predict(self._prepare(batch)).numpy()
+
+    def explain(self, batch):
+        preds, cams = self._explain(self._prepare(batch))
+        return preds.numpy(), cams.numpy()
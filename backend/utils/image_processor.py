@@ -1,38 +1,118 @@
-import cv2, numpy as np, tensorflow as tf, base64
+import os, io, threading, cv2, numpy as np, base64
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+REDUCED_DECODE_FLAGS = {(False, 2): cv2.IMREAD_REDUCED_COLOR_2, (False, 4): cv2.IMREAD_REDUCED_COLOR_4, (False, 8): cv2.IMREAD_REDUCED_COLOR_8,
+                        (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2, (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4, (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+OCT_ENHANCE_MODES = ('full', 'downscaled', 'fast', 'bilateral', 'median')
 
 class ImageProcessor:
-    def __init__(self):
-        self.target_size = (224, 224)
-    
-    def preprocess_fundus(self, image_path):
-        img = cv2.imread(image_path); img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    def __init__(self, reduced_decode_min_side=0, oct_enhance_mode='full', batch_workers=None):
+        if oct_enhance_mode not in OCT_ENHANCE_MODES: raise ValueError(f"Unknown OCT enhance mode '{oct_enhance_mode}', expected one of {OCT_ENHANCE_MODES}.")
+        self.target_size = (224, 224); self.reduced_decode_min_side = reduced_decode_min_side; self.oct_enhance_mode = oct_enhance_mode
+        self.batch_workers = batch_workers or os.cpu_count() or 1; self._executor = None; self._executor_lock = threading.Lock(); self._local = threading.local()
+
+    def _clahe(self, kind):
+        # CLAHE objects keep scratch buffers, so each thread reuses its own instead of creating one per image.
+        clahes = getattr(self._local, 'clahes', None)
+        if clahes is None:
+            clahes = self._local.clahes = {'fundus': cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)), 'oct': cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))}
+        return clahes[kind]
+
+    def decode_image(self, source, grayscale=False):
+        """Decodes a file path, encoded bytes / 1-D uint8 buffer, or passes through an already decoded (BGR or gray) array."""
+        if isinstance(source, np.ndarray) and source.ndim > 1:
+            if grayscale and source.ndim == 3: return cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+            if not grayscale and source.ndim == 2: return cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+            return source
+        buffer = np.fromfile(source, dtype=np.uint8) if isinstance(source, (str, os.PathLike)) else np.frombuffer(source, dtype=np.uint8)
+        factor = self._reduction_factor(buffer)
+        img = cv2.imdecode(buffer, REDUCED_DECODE_FLAGS[(grayscale, factor)] if factor > 1 else (cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR))
+        if img is None: raise ValueError("Could not decode image data.")
+        return img
+
+    def _reduction_factor(self, buffer):
+        # libjpeg can decode at 1/2, 1/4 or 1/8 scale directly; only worth it when the image stays well above target size.
+        if not self.reduced_decode_min_side or buffer[:2].tobytes() != b'\xff\xd8': return 1
+        try:
+            with Image.open(io.BytesIO(buffer)) as header: min_side = min(header.size)
+        except Exception: return 1
+        for factor in (8, 4, 2):
+            if min_side // factor >= self.reduced_decode_min_side: return factor
+        return 1
+
+    def preprocess_fundus(self, source):
+        img = self.decode_image(source); img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         lab = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2LAB); l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)); cl = clahe.apply(l)
+        cl = self._clahe('fundus').apply(l)
         limg = cv2.merge((cl, a, b)); final_img = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
         resized_img = cv2.resize(final_img, self.target_size)
         return np.array(resized_img, dtype=np.uint8)
-    
-    def enhance_oct(self, image_path):
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        img_denoised = cv2.fastNlMeansDenoising(img, None, 10, 7, 21)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)); img_enhanced = clahe.apply(img_denoised)
+
+    def enhance_oct(self, source, mode=None):
+        img = self.decode_image(source, grayscale=True)
+        img_denoised = self.denoise_oct(img, mode or self.oct_enhance_mode)
+        img_enhanced = self._clahe('oct').apply(img_denoised)
         img_rgb = cv2.cvtColor(img_enhanced, cv2.COLOR_GRAY2RGB)
         resized_img = cv2.resize(img_rgb, self.target_size)
         return np.array(resized_img, dtype=np.uint8)
 
-    def generate_grad_cam(self, model, img_array, last_conv_layer_name):
-        img_batch = np.expand_dims(img_array, axis=0)
-        preprocessed_img = tf.keras.applications.efficientnet_v2.preprocess_input(img_batch)
-        grad_model = tf.keras.models.Model(model.inputs, [model.get_layer(last_conv_layer_name).output, model.output])
-        with tf.GradientTape() as tape:
-            last_conv_layer_output, preds = grad_model(preprocessed_img)
-            pred_index = tf.argmax(preds[0]); class_channel = preds[:, pred_index]
-        grads = tape.gradient(class_channel, last_conv_layer_output)
-        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2)); last_conv_layer_output = last_conv_layer_output[0]
-        heatmap = last_conv_layer_output @ pooled_grads[..., tf.newaxis]; heatmap = tf.squeeze(heatmap)
-        heatmap = tf.maximum(heatmap, 0) / tf.math.reduce_max(heatmap); heatmap = heatmap.numpy()
-        heatmap = cv2.resize(heatmap, (img_array.shape[1], img_array.shape[0])); heatmap = np.uint8(255 * heatmap)
+    def denoise_oct(self, img, mode):
+        """'full' denoises the B-scan at source resolution; the other modes first area-downscale it, keeping its aspect
+        ratio, until it fits within twice the target size."""
+        if mode == 'full': return cv2.fastNlMeansDenoising(img, None, 10, 7, 21)
+        scale = min(2 * self.target_size[0] / img.shape[1], 2 * self.target_size[1] / img.shape[0])
+        if scale < 1: img = cv2.resize(img, (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        if mode == 'downscaled': return cv2.fastNlMeansDenoising(img, None, 10, 7, 21)
+        if mode == 'fast': return cv2.fastNlMeansDenoising(img, None, 10, 5, 11)
+        if mode == 'bilateral': return cv2.bilateralFilter(img, 5, 40, 5)
+        if mode == 'median': return cv2.medianBlur(img, 3)
+        raise ValueError(f"Unknown OCT enhance mode '{mode}', expected one of {OCT_ENHANCE_MODES}.")
+
+    def overlay_heatmap(self, img_array, cam):
+        heatmap = cv2.resize(cam, (img_array.shape[1], img_array.shape[0])); heatmap = np.uint8(255 * heatmap)
         heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
         superimposed_img = cv2.addWeighted(img_array, 0.6, heatmap, 0.4, 0)
-        _, buffer = cv2.imencode('.jpg', cv2.cvtColor(superimposed_img, cv2.COLOR_RGB2BGR))
+        return self.encode_jpeg_b64(superimposed_img)
+
+    def encode_jpeg_b64(self, img_array):
+        _, buffer = cv2.imencode('.jpg', cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR))
         return base64.b64encode(buffer).decode('utf-8')
+
+    # Batch variants: OpenCV releases the GIL, so images are processed on a thread pool and written straight into a
+    # preallocated, contiguous (N, H, W, 3) uint8 array that can go to preprocess_input without another copy.
+    def preprocess_fundus_batch(self, sources, out=None):
+        return self._map_into(self.preprocess_fundus, sources, out)
+
+    def enhance_oct_batch(self, sources, mode=None, out=None):
+        return self._map_into(lambda source: self.enhance_oct(source, mode), sources, out)
+
+    def overlay_heatmap_batch(self, img_batch, cams):
+        return self._map_list(self.overlay_heatmap, img_batch, cams)
+
+    def encode_jpeg_b64_batch(self, img_batch):
+        return self._map_list(self.encode_jpeg_b64, img_batch)
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None: self._executor.shutdown(wait=True); self._executor = None
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None: self._executor = ThreadPoolExecutor(max_workers=self.batch_workers, thread_name_prefix='image-batch')
+            return self._executor
+
+    def _map_list(self, fn, *batches):
+        if len(batches[0]) > 1 and self.batch_workers > 1: return list(self._pool().map(fn, *batches))
+        return [fn(*items) for items in zip(*batches)]
+
+    def _map_into(self, fn, sources, out):
+        sources = list(sources); shape = (len(sources), self.target_size[1], self.target_size[0], 3)
+        if out is None: out = np.empty(shape, dtype=np.uint8)
+        elif out.shape != shape or out.dtype != np.uint8 or not out.flags.c_contiguous: raise ValueError(f"out must be a C-contiguous uint8 array of shape {shape}.")
+        def fill(i): out[i] = fn(sources[i])
+        if len(sources) > 1 and self.batch_workers > 1: list(self._pool().map(fill, range(len(sources))))
+        else:
+            for i in range(len(sources)): fill(i)
+        return out
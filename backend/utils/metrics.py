@@ -0,0 +1,67 @@
+import bisect, contextvars, threading, time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_breakdown = contextvars.ContextVar('timing_breakdown', default=None)
+
+def _escape(value): return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels, **extra):
+    items = [*labels, *extra.items()]
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}' if items else ''
+
+class Metrics:
+    """Thread-safe latency histograms, counters and gauges rendered in the Prometheus text format. Values are per
+    process, so each gunicorn worker exposes its own series; scrape every worker or aggregate by instance."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets); self._histograms, self._counters, self._gauges = {}, {}, {}; self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items()))); index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts, totals = self._histograms.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[index] += 1; totals[0] += seconds; totals[1] += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock: self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @contextmanager
+    def time(self, stage, **labels):
+        """Records the block's duration in `stage_duration_seconds` and, inside breakdown(), in the request's breakdown."""
+        start = time.perf_counter()
+        try: yield
+        finally:
+            elapsed = time.perf_counter() - start; self.observe('stage_duration_seconds', elapsed, stage=stage, **labels)
+            timings = _breakdown.get()
+            if timings is not None:
+                key = '.'.join([stage, *map(str, labels.values())]); timings[key] = round(timings.get(key, 0.0) + elapsed * 1000, 3)
+
+    @contextmanager
+    def breakdown(self):
+        """Collects the stages timed by this thread into a dict of milliseconds for the duration of the block."""
+        token = _breakdown.set({})
+        try: yield _breakdown.get()
+        finally: _breakdown.reset(token)
+
+    def render(self):
+        with self._lock:
+            histograms, counters, gauges = dict(self._histograms), dict(self._counters), dict(self._gauges)
+            histograms = {key: (list(counts), list(totals)) for key, (counts, totals) in histograms.items()}
+        lines = []
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            for name in sorted({name for name, _ in series}):
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(labels)} {value}" for (n, labels), value in sorted(series.items()) if n == name)
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (n, labels), (counts, (total, count)) in sorted(histograms.items()):
+                if n != name: continue
+                cumulative = 0
+                for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += bucket_count; lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}"); lines.append(f"{name}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
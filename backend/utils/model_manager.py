@@ -0,0 +1,147 @@
+import threading, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+class ServedModel:
+    """One loaded model version: its inference engine and the micro-batcher in front of it. A retired version keeps
+    serving the requests that already hold it and closes its batcher when the last one releases it."""
+    def __init__(self, name, version, engine, batcher):
+        self.name, self.version, self.engine, self.batcher = name, version, engine, batcher
+        self._users = 0; self._retired = False; self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock: self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1; idle = self._retired and self._users == 0
+        if idle: self._close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True; idle = self._users == 0
+        if idle: self._close()
+
+    def _close(self):
+        if self.batcher is not None: self.batcher.close()
+
+class ModelManager:
+    """Loads the serving models concurrently on a background thread and warms each one up before serving it.
+    Loading is split in two: `fetch(name)` resolves and downloads a model without running TensorFlow ops, so it can
+    run in a gunicorn master before fork; `build(name, source)` returns (version, engine) and must run in the worker.
+    With `resolve(name)` (the registry's current version) and `poll_interval`, newer versions are loaded, warmed up and
+    swapped in while requests holding the old version finish on it; `on_swap(name, old, new)` runs after each swap."""
+    def __init__(self, names, fetch, build, make_batcher, warmup_input, resolve=None, poll_interval=0, on_swap=None):
+        self.names = list(names); self._fetch, self._build, self._make_batcher, self._warmup_input = fetch, build, make_batcher, warmup_input
+        self._resolve, self.poll_interval, self._on_swap = resolve, poll_interval, on_swap
+        self._models, self._sources, self._errors, self._load_seconds = {}, {}, {}, {}
+        self._lock = threading.Lock(); self._ready = threading.Event(); self._stop = threading.Event()
+        self._thread = None; self._poller = None; self._started_at = None; self.time_to_ready = None
+        self._reloads = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-reload'); self.last_reload = None
+
+    def prefetch(self):
+        """Fetches every model in parallel and waits, leaving no threads behind; safe to call before forking."""
+        with ThreadPoolExecutor(max_workers=len(self.names), thread_name_prefix='model-fetch') as pool:
+            for name, source in zip(self.names, pool.map(self._try_fetch, self.names)):
+                if source is not None: self._sources[name] = source
+
+    def start(self):
+        """Starts loading (and registry polling, if enabled) in the background once per process and returns immediately."""
+        with self._lock:
+            if self._thread is not None: return
+            self._started_at = time.monotonic(); self._thread = threading.Thread(target=self._load_all, name='model-loader', daemon=True); self._thread.start()
+
+    def reload(self, names=None, force=False):
+        """Queues a background reload of `names` (default: all) and returns a Future of the names that were swapped.
+        Without `force`, a model is only reloaded when the registry reports a different version than the one served."""
+        return self._reloads.submit(self._reload, list(names or self.names), force)
+
+    def wait_ready(self, timeout=None): return self._ready.wait(timeout)
+
+    def is_ready(self): return self._ready.is_set()
+
+    def get(self, name): return self._models.get(name)
+
+    @contextmanager
+    def use(self, name):
+        """Holds the currently served version of `name` (or None) for the duration of a request."""
+        with self._lock:
+            served = self._models.get(name)
+            if served is not None: served.acquire()
+        try: yield served
+        finally:
+            if served is not None: served.release()
+
+    def status(self):
+        with self._lock:
+            return {'ready': self._ready.is_set(), 'loading': self._thread is not None and self._thread.is_alive(), 'time_to_ready_s': self.time_to_ready,
+                    'last_reload': self.last_reload, 'poll_interval_s': self.poll_interval if self._resolve else 0,
+                    'models': {name: {'loaded': name in self._models, 'version': getattr(self._models.get(name), 'version', None),
+                                      'engine': type(self._models[name].engine).__name__ if name in self._models else None,
+                                      'load_seconds': self._load_seconds.get(name), 'error': self._errors.get(name)} for name in self.names}}
+
+    def close(self):
+        self._stop.set(); self._reloads.shutdown(wait=False, cancel_futures=True)
+        with self._lock: served, self._models = list(self._models.values()), {}
+        for model in served: model.retire()
+
+    def _try_fetch(self, name):
+        try: return self._fetch(name)
+        except Exception as e:
+            traceback.print_exc(); self._errors[name] = str(e) or type(e).__name__; return None
+
+    def _load(self, name, source=None):
+        """Fetches (unless `source` is given), builds and warms up one model, then swaps it in. Returns True on success."""
+        start = time.monotonic(); source = source or self._try_fetch(name)
+        if source is None: return False
+        try:
+            version, engine = self._build(name, source)
+            engine.explain(self._warmup_input(name))  # traces the graph / allocates tensors before the first real request
+            served = ServedModel(name, version, engine, self._make_batcher(name, engine))
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock: self._errors[name] = str(e) or type(e).__name__
+            return False
+        with self._lock:
+            old = self._models.get(name); self._models[name] = served; self._errors.pop(name, None); self._load_seconds[name] = round(time.monotonic() - start, 3)
+            if not self._ready.is_set() and all(n in self._models for n in self.names):
+                self.time_to_ready = round(time.monotonic() - self._started_at, 3); self._ready.set()
+        print(f"Model '{name}' version {version} ready ({type(engine).__name__}, {self._load_seconds[name]:.1f}s).")
+        if old is not None: old.retire()
+        if self._on_swap is not None: self._on_swap(name, old, served)
+        return True
+
+    def _load_all(self):
+        with ThreadPoolExecutor(max_workers=len(self.names), thread_name_prefix='model-load') as pool:
+            list(pool.map(lambda name: self._load(name, self._take_prefetched(name)), self.names))
+        if self._resolve is not None and self.poll_interval > 0:
+            self._poller = threading.Thread(target=self._poll, name='model-poller', daemon=True); self._poller.start()
+
+    def _take_prefetched(self, name):
+        """The source fetched before fork, if the registry still serves that version. Workers respawned after a promotion
+        inherit the master's boot-time sources and must fetch the current version instead."""
+        source = self._sources.pop(name, None)
+        if source is None or self._resolve is None: return source
+        try: current = self._resolve(name)
+        except Exception as e:
+            print(f"Error checking the registry for '{name}', using the prefetched version: {e}"); return source
+        if str(current) == str(source.get('version')): return source
+        print(f"Prefetched '{name}' version {source.get('version')} is stale (registry serves {current}); fetching it again."); return None
+
+    def _reload(self, names, force):
+        if self._thread is not None: self._thread.join()  # never race the initial load
+        swapped = []
+        for name in names:
+            current = self._models.get(name)
+            try: latest = self._resolve(name) if self._resolve is not None and not force else None
+            except Exception as e:
+                print(f"Error checking the registry for '{name}': {e}"); continue
+            if current is not None and not force and latest == current.version: continue
+            if self._load(name): swapped.append(name)
+        self.last_reload = {'at': time.time(), 'swapped': swapped}
+        return swapped
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try: self.reload().result()  # through the reload executor, so it never overlaps an admin reload
+            except Exception: traceback.print_exc()
@@ -0,0 +1,56 @@
+import cProfile, os, threading, time, tracemalloc
+
+class RequestProfiler:
+    """Profiles one in every `sample_every` requests. Subclasses implement _start() -> state (None to skip) and _stop(state, path),
+    and register themselves in PROFILERS under the name used by PROFILE_MODE."""
+    def __init__(self, sample_every, output_dir):
+        self.sample_every, self.output_dir = max(1, int(sample_every)), output_dir
+        self._count = 0; self._lock = threading.Lock(); os.makedirs(output_dir, exist_ok=True)
+
+    def start(self):
+        """Returns a token for stop(), or None when this request is not sampled."""
+        with self._lock:
+            self._count += 1; sample = self._count
+            if sample % self.sample_every: return None
+        state = self._start()
+        return None if state is None else (sample, state)
+
+    def stop(self, token, label):
+        if token is None: return
+        sample, state = token
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{sample}_{label.strip('/').replace('/', '_') or 'root'}"
+        self._stop(state, os.path.join(self.output_dir, name))
+
+class CProfileProfiler(RequestProfiler):
+    """cProfile of the request thread, written as a .prof file for pstats/snakeviz."""
+    def _start(self):
+        profile = cProfile.Profile(); profile.enable(); return profile
+
+    def _stop(self, profile, path):
+        profile.disable(); profile.dump_stats(f"{path}.prof")
+
+class TracemallocProfiler(RequestProfiler):
+    """Allocation sites of a request. tracemalloc is process-wide, so only one request is traced at a time."""
+    def __init__(self, sample_every, output_dir, top=25):
+        super().__init__(sample_every, output_dir); self.top = top; self._busy = threading.Lock()
+
+    def _start(self):
+        if not self._busy.acquire(blocking=False): return None
+        tracemalloc.start(); return True
+
+    def _stop(self, token, path):
+        try:
+            snapshot = tracemalloc.take_snapshot(); current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop(); self._busy.release()
+        with open(f"{path}.tracemalloc.txt", 'w') as f:
+            f.write(f"current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n")
+            for stat in snapshot.statistics('lineno')[:self.top]: f.write(f"{stat}\n")
+
+PROFILERS = {'cprofile': CProfileProfiler, 'tracemalloc': TracemallocProfiler}
+
+def make_profiler(mode, sample_every, output_dir):
+    """The configured profiler, or None when profiling is off (no mode or sample_every <= 0)."""
+    if not mode or sample_every <= 0: return None
+    if mode not in PROFILERS: raise ValueError(f"PROFILE_MODE must be one of {sorted(PROFILERS)}")
+    return PROFILERS[mode](sample_every, output_dir)
@@ -0,0 +1,110 @@
+import json, os, re, tempfile, threading, time, uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+STATUS_FIELDS = ('id', 'status', 'filename', 'error', 'submitted_at', 'started_at', 'finished_at')
+
+class ReportQueueFull(RuntimeError):
+    pass
+
+class ReportQueue:
+    """Builds PDF reports on a bounded worker pool. Jobs are tracked in memory by ID until `retention_seconds` after they
+    finish, and every status change is also written to `<id>.json` next to the reports, so any worker process can answer
+    for any job, pruned or not. `on_done(status)` is called with each finished job's status."""
+    def __init__(self, pdf_generator, max_workers=2, max_pending=64, retention_seconds=3600, on_done=None):
+        self.pdf_generator, self.max_pending, self.retention, self.on_done = pdf_generator, max_pending, retention_seconds, on_done
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reports')
+        self._jobs = {}; self._lock = threading.Lock()
+
+    def submit(self, patient_data, analysis_results, recommendations):
+        """`recommendations` may be a string or a Future of one; the report layout starts before it resolves."""
+        with self._lock:
+            self._prune()
+            if sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running')) >= self.max_pending:
+                raise ReportQueueFull(f"{self.max_pending} reports are already pending.")
+            job_id = uuid.uuid4().hex
+            job = self._jobs[job_id] = {'id': job_id, 'status': 'queued', 'filename': None, 'error': None, 'submitted_at': time.time(), 'started_at': None, 'finished_at': None, 'done': Future()}
+            snapshot = self._snapshot(job)
+        self._write_status(snapshot)
+        self._executor.submit(self._layout, job, patient_data, analysis_results, recommendations)
+        return job_id
+
+    def status(self, job_id):
+        with self._lock: job = self._jobs.get(job_id); snapshot = self._snapshot(job) if job is not None else None
+        return snapshot if snapshot is not None else self._read_status(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Waits up to `timeout` for a job this process is building; jobs known only from disk are returned as they are."""
+        with self._lock: job = self._jobs.get(job_id)
+        if job is None: return self._read_status(job_id)
+        try: job['done'].result(timeout)
+        except TimeoutError: pass
+        return self.status(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values(): counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _layout(self, job, patient_data, analysis_results, recommendations):
+        self._update(job, status='running', started_at=time.time())
+        try: draft = self.pdf_generator.layout_report(patient_data, analysis_results, job['id'])
+        except Exception as e: return self._finish(job, error=e)
+        if isinstance(recommendations, Future) and not recommendations.done():
+            # Finished from the callback instead of parking this pool thread while the LLM call is in flight.
+            recommendations.add_done_callback(lambda f: self._submit_finalize(job, draft, f))
+        else: self._finalize(job, draft, recommendations)
+
+    def _submit_finalize(self, job, draft, recommendations):
+        try: self._executor.submit(self._finalize, job, draft, recommendations)
+        except RuntimeError as e: self._finish(job, error=e)  # the queue was closed meanwhile
+
+    def _finalize(self, job, draft, recommendations):
+        try:
+            if isinstance(recommendations, Future): recommendations = recommendations.result()
+            filename = self.pdf_generator.finalize_report(draft, recommendations)
+        except Exception as e: return self._finish(job, error=e)
+        self._finish(job, filename=filename)
+
+    def _finish(self, job, filename=None, error=None):
+        if error is not None: print(f"Error generating report {job['id']}: {error}")
+        status = self._update(job, status='ready' if error is None else 'failed', filename=filename, error=None if error is None else str(error), finished_at=time.time())
+        job['done'].set_result(status)
+        if self.on_done is not None: self.on_done(status)
+
+    def _update(self, job, **fields):
+        with self._lock: job.update(fields); snapshot = self._snapshot(job)
+        self._write_status(snapshot)
+        return snapshot
+
+    @staticmethod
+    def _snapshot(job): return {k: job[k] for k in STATUS_FIELDS}
+
+    def _status_path(self, job_id):
+        directory = getattr(self.pdf_generator, 'reports_dir', None)
+        return os.path.join(directory, f"{job_id}.json") if directory and JOB_ID_PATTERN.match(job_id) else None
+
+    def _write_status(self, snapshot):
+        path = self._status_path(snapshot['id'])
+        if path is None: return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f: json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing report status {snapshot['id']}: {e}")
+
+    def _read_status(self, job_id):
+        path = self._status_path(job_id)
+        if path is None: return None
+        try:
+            with open(path, 'r') as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [k for k, job in self._jobs.items() if job['finished_at'] and job['finished_at'] < cutoff]: del self._jobs[job_id]
@@ -0,0 +1,47 @@
+import threading, time, hashlib
+from collections import OrderedDict
+
+class ResultCache:
+    """LRU + TTL cache of analysis results keyed by image content, model name/version and image type, bounded by payload size."""
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=3600, clock=time.monotonic):
+        self.max_bytes, self.ttl, self.clock = max_bytes, ttl_seconds, clock
+        self._entries = OrderedDict(); self._lock = threading.Lock(); self._size = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    @staticmethod
+    def make_key(image_data, model_name, model_version, image_type):
+        return (hashlib.sha256(image_data).hexdigest(), model_name, str(model_version), image_type)
+
+    @staticmethod
+    def _sizeof(value):
+        return 256 + sum(len(v) for v in value if isinstance(v, str))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[1] > self.ttl: self._remove(key); entry = None
+            if entry is None: self.misses += 1; return None
+            self._entries.move_to_end(key); self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        if size > self.max_bytes: return
+        with self._lock:
+            if key in self._entries: self._remove(key)
+            while self._entries and self._size + size > self.max_bytes:
+                self._remove(next(iter(self._entries))); self.evictions += 1
+            self._entries[key] = (value, self.clock(), size); self._size += size
+
+    def invalidate(self, model_name=None):
+        with self._lock:
+            for key in [k for k in self._entries if model_name is None or k[1] == model_name]: self._remove(key)
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key)[2]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,9 @@
+from config import Config
+
+def get_severity(disease, confidence, image_type):
+    severity_mappings = Config.SEVERITY_LEVELS[image_type].get(disease)
+    if not severity_mappings: return "Not Applicable"
+    if isinstance(severity_mappings, str): return severity_mappings
+    for threshold, level in severity_mappings:
+        if confidence >= threshold: return level
+    return "Undetermined"
@@ -0,0 +1,39 @@
+import threading, numpy as np, tensorflow as tf
+from utils.grad_cam import GradCamEngine
+
+QUANTIZATION_MODES = ('float32', 'float16', 'int8')
+
+def convert_to_tflite(model, quantization='float32', representative_images=None):
+    """Converts the model's Grad-CAM pass to a TFLite flatbuffer that returns probabilities and CAMs from one invoke.
+    int8 calibrates activations on `representative_images`, an iterable of preprocessed float32 images. The head's
+    ReLU gradient has no builtin kernel, so it runs on the TF Select kernels bundled with tf.lite.Interpreter."""
+    if quantization not in QUANTIZATION_MODES: raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}")
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([GradCamEngine(model).explain_function()], model)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    if quantization != 'float32': converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16': converter.target_spec.supported_types = [tf.float16]
+    if quantization == 'int8':
+        if representative_images is None: raise ValueError("int8 quantization needs representative images to calibrate on.")
+        converter.representative_dataset = lambda: ([np.asarray(image, dtype=np.float32)[None]] for image in representative_images)
+    return converter.convert()
+
+class TFLiteEngine:
+    """Serves an artifact written by convert_to_tflite with the same predict/explain contract as GradCamEngine.
+    The interpreter is not thread-safe, so calls are serialized; the micro-batcher already runs them on one thread.
+    `model_content` serves flatbuffer bytes in place, e.g. bytes read before fork and shared by the workers."""
+    def __init__(self, model_path=None, num_threads=None, model_content=None):
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, model_content=model_content, num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]['index']; self._batch_size = None; self._lock = threading.Lock()
+
+    def _run(self, images):
+        if images.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input, images.shape); self.interpreter.allocate_tensors(); self._batch_size = images.shape[0]
+        self.interpreter.set_tensor(self._input, images); self.interpreter.invoke()
+        outputs = [self.interpreter.get_tensor(detail['index']) for detail in self.interpreter.get_output_details()]
+        return next(o for o in outputs if o.ndim == 2).copy(), next(o for o in outputs if o.ndim == 3).copy()
+
+    def predict(self, batch): return self.explain(batch)[0]
+
+    def explain(self, batch):
+        images = tf.keras.applications.efficientnet_v2.preprocess_input(np.asarray(batch, dtype=np.float32))
+        with self._lock: return self._run(np.ascontiguousarray(images))